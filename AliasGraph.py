@@ -0,0 +1,108 @@
+from typing import Container, Iterable
+
+_EMPTY: frozenset[int] = frozenset()
+
+
+class AliasGraph:
+    """
+    同名卡 (alias) 的正向與反向索引, alias 為 0 的卡不記錄
+    target 為 id -> alias, sources 為 alias -> 以它為同名卡的 id 集合
+    每張卡只有一個 alias, 修改或刪除時只需更新該卡的一條邊
+    不記錄卡片是否存在, 指向不存在的卡由呼叫端提供的集合判斷
+    """
+
+    target: dict[int, int]
+    sources: dict[int, set[int]]
+
+    def __init__(self):
+        self.target = {}
+        self.sources = {}
+
+    def build(self, pairs: Iterable[tuple[int, int]]):
+        """以 (id, alias) 重建整個索引"""
+        self.target = {id: alias for id, alias in pairs if alias}
+        self.sources = {}
+        for id, alias in self.target.items():
+            if (id_set := self.sources.get(alias)) is None:
+                self.sources[alias] = {id}
+            else:
+                id_set.add(id)
+
+    def add(self, id: int, alias: int):
+        """加入或更新 id 的同名卡, alias 為 0 時移除"""
+        old = self.target.get(id, 0)
+        if old == alias:
+            return
+        if old:
+            self._unlink(id, old)
+        if alias:
+            self.target[id] = alias
+            self.sources.setdefault(alias, set()).add(id)
+        else:
+            del self.target[id]
+
+    def discard(self, id: int):
+        """移除 id 指向同名卡的邊, 以 id 為同名卡的卡保留, 之後成為指向不存在的卡"""
+        if (old := self.target.pop(id, 0)) != 0:
+            self._unlink(id, old)
+
+    def _unlink(self, id: int, alias: int):
+        id_set = self.sources[alias]
+        id_set.discard(id)
+        if not id_set:
+            del self.sources[alias]
+
+    # ---------------- 查詢 ----------------
+    def alias_of(self, id: int) -> int:
+        return self.target.get(id, 0)
+
+    def aliases_of(self, id: int) -> set[int] | frozenset[int]:
+        """回傳以 id 為同名卡的 id 集合, 呼叫端不可修改"""
+        return self.sources.get(id, _EMPTY)
+
+    def resolve(self, id: int) -> tuple[list[int], bool]:
+        """
+        從 id 沿著同名卡走到沒有 alias 的卡, 回傳經過的 id (含 id 本身) 與是否形成循環
+        形成循環時最後一個 id 為重複出現的卡
+        """
+        chain = [id]
+        seen = {id}
+        target = self.target
+        while (id := target.get(id, 0)) != 0:
+            chain.append(id)
+            if id in seen:
+                return chain, True
+            seen.add(id)
+        return chain, False
+
+    def find_cycles(self) -> list[list[int]]:
+        """
+        回傳所有循環, 每個循環為依指向順序排列的 id, 指向自己的卡為單獨一個 id 的循環
+        每張卡只有一條出邊, 每張卡最多走訪一次
+        """
+        target = self.target
+        done: set[int] = set()
+        cycles = []
+        for start in target:
+            if start in done:
+                continue
+            path = []
+            pos: dict[int, int] = {}
+            id = start
+            while id in target and id not in done and id not in pos:
+                pos[id] = len(path)
+                path.append(id)
+                id = target[id]
+            if id in pos:
+                cycles.append(path[pos[id] :])
+            done.update(path)
+        return cycles
+
+    def find_dangling(self, exists: Container[int]) -> list[int]:
+        """回傳同名卡不在 exists 中的 id, 依 id 排序"""
+        return sorted(
+            id
+            for alias, id_set in self.sources.items()
+            if alias not in exists
+            for id in id_set
+        )
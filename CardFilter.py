@@ -0,0 +1,147 @@
+import re
+from functools import reduce
+from itertools import compress, repeat
+from operator import and_, eq, ne, gt, ge, lt, le
+from typing import TYPE_CHECKING
+from ConfigLoader import CardInfo
+
+if TYPE_CHECKING:
+    from DataBase import CDB
+
+# 可篩選的欄位, 與 datas 表的欄位名稱相同
+FILTER_KEYS: list[str] = [
+    "id",
+    "ot",
+    "alias",
+    "setcode",
+    "type",
+    "atk",
+    "def",
+    "level",
+    "race",
+    "attribute",
+    "category",
+]
+# 編輯器上的中文標題
+FILTER_KEY_ALIAS: dict[str, str] = {
+    "类型": "type",
+    "战力": "atk",
+    "生命": "def",
+    "补给": "level",
+    "类别": "race",
+    "特性": "attribute",
+}
+# & 為包含全部位元, !& 為不包含全部位元
+FILTER_OPS: dict[str, object] = {
+    ">=": ge,
+    "<=": le,
+    "!=": ne,
+    "!&": None,
+    "=": eq,
+    ">": gt,
+    "<": lt,
+    "&": None,
+}
+
+_COND_RE = re.compile(
+    r"([^\s<>=!&]+)(" + "|".join(re.escape(op) for op in FILTER_OPS) + r")(\S+)"
+)
+
+
+class Cond:
+    key: str
+    op: str
+    value: int
+
+    def __init__(self, key: str, op: str, value: int):
+        self.key = key
+        self.op = op
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"{self.key}{self.op}0x{self.value:X}"
+
+
+# 將 cardinfo 中的標題轉為數值, 例如 舰队 -> 0x2, 单位卡 -> 0x21
+def _label_value(key: str, label: str, info: CardInfo | None) -> int | None:
+    if info is None:
+        return None
+    if key == "type":
+        _, typ_dict, _ = info.get_key("typ")
+        if (sub_key := typ_dict.get(label)) is not None:
+            return int(info.get_key(sub_key)[2], 0)
+        info_key_lst = list(typ_dict.values())
+    elif key in ("race", "attribute"):
+        info_key_lst = [key]
+    else:
+        return None
+    for info_key in info_key_lst:
+        _, key_dict, _ = info.get_key(info_key)
+        if (value := key_dict.get(label)) is not None:
+            return int(value, 0)
+    return None
+
+
+def parse_filter(expr: str, info: CardInfo | None = None) -> list[Cond]:
+    """
+    解析篩選式, 以空白分隔的條件全部成立時符合, 例如
+    "atk>=3000 attribute&舰队", "type&0x2 level<=3", "类型=部队"
+    數值可用 10 進位, 0x 開頭的 16 進位, 或 cardinfo.txt 中的標題
+    格式錯誤時丟出 ValueError
+    """
+    cond_lst = []
+    for token in expr.split():
+        if (m := _COND_RE.fullmatch(token)) is None:
+            raise ValueError(f"无法解析条件 {token}")
+        key, op, txt = m.groups()
+        key = FILTER_KEY_ALIAS.get(key, key.lower())
+        if key not in FILTER_KEYS:
+            raise ValueError(f"未知的栏位 {key}")
+        try:
+            value = int(txt, 0)
+        except ValueError:
+            if (value := _label_value(key, txt, info)) is None:
+                raise ValueError(f"未知的数值 {txt}")
+        cond_lst.append(Cond(key, op, value))
+    return cond_lst
+
+
+# 回傳 cond 在整個欄位上的布林值迭代器, 逐欄運算不經過 Card 屬性
+def _cond_mask(col, cond: Cond):
+    value_rep = repeat(cond.value)
+    if cond.op == "&":
+        return map(eq, map(and_, col, value_rep), repeat(cond.value))
+    if cond.op == "!&":
+        return map(ne, map(and_, col, value_rep), repeat(cond.value))
+    return map(FILTER_OPS[cond.op], col, value_rep)
+
+
+def cond_to_sql(cond_lst: list[Cond]) -> tuple[str, list[int]]:
+    """
+    將條件轉為 datas 表的 WHERE 子句與參數, 沒有條件時回傳空字串
+    不需載入整個 cdb 即可篩選, 供命令列工具使用
+    """
+    part_lst = []
+    params = []
+    for cond in cond_lst:
+        col = f'"{cond.key}"'
+        if cond.op in ("&", "!&"):
+            op = "=" if cond.op == "&" else "!="
+            part_lst.append(f"({col} & ?) {op} ?")
+            params += [cond.value, cond.value]
+        else:
+            part_lst.append(f"{col} {cond.op} ?")
+            params.append(cond.value)
+    if not part_lst:
+        return "", []
+    return "WHERE " + " AND ".join(part_lst), params
+
+
+def eval_filter(cdb: "CDB", cond_lst: list[Cond]) -> list[int]:
+    """回傳 cdb 中符合所有條件的已排序 id"""
+    id_col = cdb.get_column("id")
+    if not cond_lst:
+        return sorted(id_col)
+    mask_lst = [_cond_mask(cdb.get_column(cond.key), cond) for cond in cond_lst]
+    mask = reduce(lambda a, b: map(and_, a, b), mask_lst)
+    return sorted(compress(id_col, mask))
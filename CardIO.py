@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+import sqlite3
+from itertools import islice
+from typing import Callable, Iterable, Iterator, TextIO
+from DataBase import (
+    Card,
+    DATA_KEYS,
+    LOAD_ARRAYSIZE,
+    ROW_KEYS,
+    TEXT_KEYS,
+    full_row_to_card,
+    iter_full_rows,
+    open_cdb_conn,
+    sql_insert_datas,
+    sql_insert_texts,
+    sql_replace_datas,
+    sql_replace_texts,
+    sql_set_datas,
+    sql_set_texts,
+)
+
+# 匯出檔的欄位為 ROW_KEYS: datas 全欄 + texts 除 id 外的全欄
+_DATA_CT = len(DATA_KEYS)
+# 匯入時每次 executemany 的列數
+IMPORT_BATCH = 2000
+# 略過已存在 id 的寫入
+sql_ignore_datas = sql_insert_datas.replace("INSERT", "INSERT OR IGNORE", 1)
+sql_ignore_texts = sql_insert_texts.replace("INSERT", "INSERT OR IGNORE", 1)
+
+
+# 將匯入的一筆資料轉為 ROW_KEYS 順序的列, 缺少的欄位為 0 或空字串
+def _to_row(record: dict, line: int) -> tuple:
+    row = []
+    for key in DATA_KEYS:
+        value = record.get(key)
+        if value in (None, ""):
+            if key == "id":
+                raise ValueError(f"第 {line} 笔缺少 id")
+            value = 0
+        elif isinstance(value, str):
+            # 0x 開頭為十六進位, 其他為十進位, 手動編輯的 010 視為 10
+            text = value.strip()
+            base = 16 if text.lstrip("+-").lower().startswith("0x") else 10
+            try:
+                value = int(text, base)
+            except ValueError:
+                raise ValueError(f"第 {line} 笔的 {key} 不是整数: {value}")
+        elif isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"第 {line} 笔的 {key} 不是整数: {value}")
+        row.append(value)
+    for key in TEXT_KEYS:
+        value = record.get(key)
+        row.append("" if value is None else str(value))
+    return tuple(row)
+
+
+# ---------------- CSV ----------------
+def write_csv(rows: Iterable[tuple], f: TextIO) -> int:
+    writer = csv.writer(f)
+    writer.writerow(ROW_KEYS)
+    ct = 0
+    while batch := list(islice(rows, LOAD_ARRAYSIZE)):
+        writer.writerows(batch)
+        ct += len(batch)
+    return ct
+
+
+def read_csv(f: TextIO) -> Iterator[tuple]:
+    for line, record in enumerate(csv.DictReader(f), 1):
+        yield _to_row(record, line)
+
+
+# ---------------- JSON Lines ----------------
+_json_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def write_jsonl(rows: Iterable[tuple], f: TextIO) -> int:
+    ct = 0
+    while batch := list(islice(rows, LOAD_ARRAYSIZE)):
+        f.writelines(_json_encode(dict(zip(ROW_KEYS, row))) + "\n" for row in batch)
+        ct += len(batch)
+    return ct
+
+
+def read_jsonl(f: TextIO) -> Iterator[tuple]:
+    for line, text in enumerate(f, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"第 {line} 行不是 JSON: {e}")
+        if not isinstance(record, dict):
+            raise ValueError(f"第 {line} 行不是 JSON 对象")
+        yield _to_row(record, line)
+
+
+# 副檔名 -> (寫入, 讀取, 檔案編碼), csv 帶 BOM 讓 Excel 正確辨識 utf-8
+FORMATS: dict[str, tuple[Callable, Callable, str]] = {
+    ".csv": (write_csv, read_csv, "utf-8-sig"),
+    ".jsonl": (write_jsonl, read_jsonl, "utf-8"),
+}
+
+
+def get_format(path: str) -> tuple[Callable, Callable, str]:
+    """依副檔名取得格式, 不支援時丟出 ValueError"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"不支援的格式 {ext}, 可用 {', '.join(FORMATS)}")
+    return FORMATS[ext]
+
+
+# ---------------- 匯出 / 匯入 ----------------
+def export_file(
+    cdb_path: str, out_path: str, where: str = "", params: Iterable = ()
+) -> int:
+    """將 cdb 中符合 where 的卡串流寫入 out_path, 回傳匯出的數量"""
+    write, _, encoding = get_format(out_path)
+    conn = sqlite3.connect(cdb_path)
+    try:
+        with open(out_path, "w", encoding=encoding, newline="") as f:
+            return write(iter_full_rows(conn, where, params), f)
+    finally:
+        conn.close()
+
+
+def iter_file_rows(path: str) -> Iterator[tuple]:
+    """串流讀取 csv 或 jsonl, 產出 ROW_KEYS 順序的列, 格式錯誤時丟出 ValueError"""
+    _, read, encoding = get_format(path)
+    with open(path, "r", encoding=encoding, newline="") as f:
+        yield from read(f)
+
+
+def check_file(path: str) -> int:
+    """串流讀取整個 csv 或 jsonl 檢查格式, 不保留內容, 回傳列數, 格式錯誤時丟出 ValueError"""
+    return sum(1 for _ in iter_file_rows(path))
+
+
+def iter_file_cards(path: str) -> Iterator[Card]:
+    """串流讀取 csv 或 jsonl 並產出 Card"""
+    return map(full_row_to_card, iter_file_rows(path))
+
+
+def import_rows(
+    conn: sqlite3.Connection, rows: Iterable[tuple], replace: bool = True
+) -> int:
+    """
+    在同一個交易中以 IMPORT_BATCH 列一批寫入 rows, 記憶體只保留一批
+    replace 為 False 時略過已存在的 id, 回傳寫入的數量, 失敗時整個交易復原
+    """
+    sql_datas = sql_replace_datas if replace else sql_ignore_datas
+    sql_texts = sql_replace_texts if replace else sql_ignore_texts
+    it = iter(rows)
+    ct = 0
+    with conn:
+        conn.execute(sql_set_datas)
+        conn.execute(sql_set_texts)
+        while batch := list(islice(it, IMPORT_BATCH)):
+            before = conn.total_changes
+            conn.executemany(sql_datas, (row[:_DATA_CT] for row in batch))
+            ct += conn.total_changes - before
+            conn.executemany(sql_texts, ((row[0], *row[_DATA_CT:]) for row in batch))
+    return ct
+
+
+def import_file(cdb_path: str, in_path: str, replace: bool = True) -> int:
+    """將 csv 或 jsonl 匯入 cdb_path, 不改變檔案的 journal 模式, 回傳寫入的數量"""
+    conn = open_cdb_conn(cdb_path, wal=False)
+    try:
+        return import_rows(conn, iter_file_rows(in_path), replace)
+    finally:
+        conn.close()
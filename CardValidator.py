@@ -0,0 +1,161 @@
+import sqlite3
+from itertools import compress
+from typing import Sequence
+from AliasGraph import AliasGraph
+from ConfigLoader import CardInfo
+from DataBase import CDB, sql_orphan_datas, sql_orphan_texts
+
+# 檢查規則 -> 說明
+RULES: dict[str, str] = {
+    "type": "卡片类型不在 cardinfo 中",
+    "attribute": "特性含有 cardinfo 没有的位",
+    "race": "类别含有 cardinfo 没有的位",
+    "alias_self": "同名卡指向自己",
+    "alias_missing": "同名卡不存在",
+    "alias_cycle": "同名卡形成循环",
+    "orphan_data": "缺少 texts 的卡片",
+    "orphan_text": "缺少 datas 的文本",
+}
+# 檢查用到的 datas 欄位
+CHECK_KEYS = ["id", "type", "race", "attribute", "alias"]
+
+sql_check_columns = (
+    f"SELECT {', '.join(f'COALESCE({key}, 0)' for key in CHECK_KEYS)} FROM datas"
+)
+
+
+class Violation:
+    """違反同一條規則的卡片, ids 依 id 排序"""
+
+    __slots__ = ("rule", "ids")
+    rule: str
+    ids: list[int]
+
+    def __init__(self, rule: str, ids: list[int]):
+        self.rule = rule
+        self.ids = ids
+
+    @property
+    def title(self) -> str:
+        return RULES[self.rule]
+
+
+class CardRules:
+    """由 cardinfo 整理出的合法值, 類型為所有子類型的集合, 特性與類別為所有選項的位元聯集"""
+
+    types: frozenset[int]
+    attribute_mask: int
+    race_mask: int
+
+    def __init__(self, info: CardInfo):
+        _, typ_dict, _ = info.get_key("typ")
+        self.types = frozenset(
+            int(value, 16)
+            for sub_key in typ_dict.values()
+            for value in info.get_key(sub_key)[1].values()
+        )
+        self.attribute_mask = self._mask(info, "attribute")
+        self.race_mask = self._mask(info, "race")
+
+    @staticmethod
+    def _mask(info: CardInfo, key: str) -> int:
+        mask = 0
+        for value in info.get_key(key)[1].values():
+            mask |= int(value, 16)
+        return mask
+
+
+# 值不合法的列的 id, 先對不重複的值判斷, 有不合法的值時才逐列比對
+def _pick(ids: Sequence[int], col: Sequence[int], bad: set[int]) -> list[int]:
+    if not bad:
+        return []
+    return sorted(compress(ids, map(bad.__contains__, col)))
+
+
+def check_columns(
+    rules: CardRules,
+    ids: Sequence[int],
+    types: Sequence[int],
+    races: Sequence[int],
+    attributes: Sequence[int],
+    aliases: Sequence[int],
+) -> list[Violation]:
+    """
+    以整欄的陣列檢查所有卡片, 各陣列的順序需相同
+    每條規則只走訪一次欄位, 判斷只對不重複的值進行, 回傳有違反的規則
+    """
+    result = []
+    bad_types = set(types) - rules.types
+    result.append(Violation("type", _pick(ids, types, bad_types)))
+    for rule, col, mask in [
+        ("attribute", attributes, rules.attribute_mask),
+        ("race", races, rules.race_mask),
+    ]:
+        bad = {value for value in set(col) if value & ~mask}
+        result.append(Violation(rule, _pick(ids, col, bad)))
+    # 同名卡: 指向自己, 指向不存在的 id, 或形成循環
+    alias_ids = [id for id, alias in zip(ids, aliases) if alias]
+    if alias_ids:
+        targets = [alias for alias in aliases if alias]
+        result.append(
+            Violation(
+                "alias_self",
+                sorted(compress(alias_ids, map(int.__eq__, alias_ids, targets))),
+            )
+        )
+        missing = set(targets).difference(ids)
+        result.append(Violation("alias_missing", _pick(alias_ids, targets, missing)))
+        # 指向自己已在 alias_self 回報, 這裡只列出兩張以上的卡形成的循環
+        graph = AliasGraph()
+        graph.build(zip(alias_ids, targets))
+        cycle_ids = [id for cycle in graph.find_cycles() if len(cycle) > 1 for id in cycle]
+        result.append(Violation("alias_cycle", sorted(cycle_ids)))
+    return [v for v in result if v.ids]
+
+
+def check_pairing(conn: sqlite3.Connection) -> list[Violation]:
+    """檢查 datas 與 texts 是否一一對應"""
+    result = [
+        Violation(rule, sorted(r[0] for r in conn.execute(sql)))
+        for rule, sql in [
+            ("orphan_data", sql_orphan_datas),
+            ("orphan_text", sql_orphan_texts),
+        ]
+    ]
+    return [v for v in result if v.ids]
+
+
+def validate_cdb(rules: CardRules, cdb: CDB) -> list[Violation]:
+    """
+    檢查記憶體中的卡片, 包含尚未寫入的修改
+    datas 與 texts 的對應只存在於檔案, 從 cdb.path 讀取, 失敗時丟出 sqlite3.Error
+    """
+    store = cdb.card_dict
+    result = check_columns(rules, *(store.column(key) for key in CHECK_KEYS))
+    conn = sqlite3.connect(cdb.path)
+    try:
+        return result + check_pairing(conn)
+    finally:
+        conn.close()
+
+
+def validate_file(rules: CardRules, path: str) -> list[Violation]:
+    """直接從 cdb 檔案讀取欄位並檢查, 失敗時丟出 sqlite3.Error"""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(sql_check_columns).fetchall()
+        pairing = check_pairing(conn)
+    finally:
+        conn.close()
+    cols = list(zip(*rows)) or [()] * len(CHECK_KEYS)
+    return check_columns(rules, *cols) + pairing
+
+
+def format_report(violations: list[Violation], limit: int = 20) -> str:
+    """每條規則一行, 最多列出 limit 個 id"""
+    msg_lst = []
+    for v in violations:
+        shown = ", ".join(str(id) for id in v.ids[:limit])
+        more = f" ... 共 {len(v.ids)} 个" if len(v.ids) > limit else ""
+        msg_lst.append(f"{v.title}: {shown}{more}")
+    return "\n".join(msg_lst)
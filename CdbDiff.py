@@ -0,0 +1,174 @@
+import os
+import sqlite3
+from typing import Callable
+from DataBase import (
+    CDB,
+    Card,
+    ROW_KEYS,
+    full_row_to_card,
+    iter_full_rows,
+    open_cdb_conn,
+    sql_replace_datas,
+    sql_replace_texts,
+    sql_set_datas,
+    sql_set_texts,
+)
+
+# 合併時 id 兩邊都有但內容不同的處理方式
+MERGE_POLICIES: dict[str, str] = {
+    "ours": "保留本地",
+    "theirs": "使用对方",
+    "newest": "较新的文件",
+    "interactive": "逐一选择",
+}
+
+
+def cdb_mtime(path: str) -> float:
+    """回傳 cdb 最後修改的時間, WAL 模式下尚未寫回主檔的修改也算在內"""
+    mtime = 0.0
+    for p in (path, path + "-wal"):
+        try:
+            mtime = max(mtime, os.path.getmtime(p))
+        except OSError:
+            pass
+    return mtime
+
+
+class CardDiff:
+    """同一個 id 在兩個 cdb 中的列, 不存在的一方為 None"""
+
+    __slots__ = ("id", "ours", "theirs")
+    id: int
+    ours: tuple | None
+    theirs: tuple | None
+
+    def __init__(self, id: int, ours: tuple | None, theirs: tuple | None):
+        self.id = id
+        self.ours = ours
+        self.theirs = theirs
+
+    def fields(self) -> list[tuple[str, object, object]]:
+        """回傳內容不同的欄位 (欄位名稱, 本地的值, 對方的值)"""
+        ours = self.ours or (None,) * len(ROW_KEYS)
+        theirs = self.theirs or (None,) * len(ROW_KEYS)
+        return [
+            (key, a, b) for key, a, b in zip(ROW_KEYS, ours, theirs) if a != b
+        ]
+
+    def describe(self) -> str:
+        """以文字列出不同的欄位"""
+        lines = [str(self.id)]
+        for key, a, b in self.fields():
+            if key == "id":
+                continue
+            lines.append(f"  {key}: {a!r} -> {b!r}")
+        return "\n".join(lines)
+
+
+class CdbDiff:
+    """
+    兩個 cdb 的差異, 以本地 (ours) 為基準
+    added 只在對方, removed 只在本地, changed 兩邊都有但內容不同
+    """
+
+    ours_path: str
+    theirs_path: str
+    added: list[CardDiff]
+    removed: list[CardDiff]
+    changed: list[CardDiff]
+    same_ct: int
+
+    def __init__(self, ours_path: str, theirs_path: str):
+        self.ours_path = ours_path
+        self.theirs_path = theirs_path
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.same_ct = 0
+
+    def summary(self) -> str:
+        return (
+            f"新增 {len(self.added)} 张, 仅本地 {len(self.removed)} 张, "
+            f"不同 {len(self.changed)} 张, 相同 {self.same_ct} 张"
+        )
+
+
+def diff_cdb(ours_path: str, theirs_path: str) -> CdbDiff:
+    """
+    以 id 順序同時串流讀取兩個 cdb 並逐列比較, 記憶體只保留有差異的列
+    讀取失敗時丟出 sqlite3.Error
+    """
+    diff = CdbDiff(ours_path, theirs_path)
+    ours_conn = sqlite3.connect(ours_path)
+    theirs_conn = sqlite3.connect(theirs_path)
+    try:
+        ours_it = iter_full_rows(ours_conn)
+        theirs_it = iter_full_rows(theirs_conn)
+        a = next(ours_it, None)
+        b = next(theirs_it, None)
+        while a is not None or b is not None:
+            if b is None or (a is not None and a[0] < b[0]):
+                diff.removed.append(CardDiff(a[0], a, None))
+                a = next(ours_it, None)
+            elif a is None or b[0] < a[0]:
+                diff.added.append(CardDiff(b[0], None, b))
+                b = next(theirs_it, None)
+            else:
+                if a == b:
+                    diff.same_ct += 1
+                else:
+                    diff.changed.append(CardDiff(a[0], a, b))
+                a = next(ours_it, None)
+                b = next(theirs_it, None)
+    finally:
+        ours_conn.close()
+        theirs_conn.close()
+    return diff
+
+
+def plan_merge(
+    diff: CdbDiff,
+    policy: str,
+    choose: Callable[[CardDiff], bool] | None = None,
+) -> list[Card]:
+    """
+    依 policy 決定要寫入本地的卡片, 只在對方的卡一律加入, 只在本地的卡保留不刪除
+    內容不同的卡: ours 保留本地, theirs 使用對方, newest 使用修改時間較新的檔案,
+    interactive 由 choose(CardDiff) 決定, 回傳 True 時使用對方
+    """
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"未知的合并方式 {policy}")
+    if policy == "interactive" and choose is None:
+        raise ValueError("逐一选择需要提供 choose")
+    if policy == "newest":
+        take_theirs = cdb_mtime(diff.theirs_path) > cdb_mtime(diff.ours_path)
+        picked = diff.changed if take_theirs else []
+    elif policy == "theirs":
+        picked = diff.changed
+    elif policy == "ours":
+        picked = []
+    else:
+        picked = [d for d in diff.changed if choose(d)]
+    return [full_row_to_card(d.theirs) for d in diff.added + picked]
+
+
+def merge_into(cdb: CDB, card_lst: list[Card]) -> int:
+    """將 plan_merge 的結果以一次 add_cards 寫入 cdb, 修改合併為一筆復原紀錄"""
+    return cdb.add_cards(card_lst, "合并")
+
+
+def merge_into_file(path: str, card_lst: list[Card]) -> int:
+    """
+    不載入整個 cdb, 直接在同一個交易中將 plan_merge 的結果寫入 path, 失敗時丟出 sqlite3.Error
+    不改變檔案的 journal 模式
+    """
+    conn = open_cdb_conn(path, wal=False)
+    try:
+        with conn:
+            conn.execute(sql_set_datas)
+            conn.execute(sql_set_texts)
+            conn.executemany(sql_replace_datas, (c.get_data_row() for c in card_lst))
+            conn.executemany(sql_replace_texts, (c.get_text_row() for c in card_lst))
+    finally:
+        conn.close()
+    return len(card_lst)
@@ -0,0 +1,375 @@
+"""
+cdb 的命令列工具, 只依賴 sqlite3 與 DataBase / ConfigLoader, 不匯入 PyQt
+供建置流程批次處理 cdb, 例如
+    python CdbTool.py query cards.cdb "类型=部队 战力>=3000"
+    python CdbTool.py merge master.cdb expansion.cdb --policy theirs
+    python CdbTool.py export cards.cdb units.csv "类型=部队"
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+import CardIO
+from CardValidator import CardRules, format_report, validate_file
+from CardFilter import Cond, parse_filter, cond_to_sql
+from CdbDiff import MERGE_POLICIES, CardDiff, diff_cdb, plan_merge, merge_into_file
+from ConfigLoader import load_cardinfo
+from DataBase import (
+    CDB,
+    INDEX_COLUMNS,
+    check_index_columns,
+    create_indexes,
+    creat_new_cdb,
+    drop_indexes,
+    get_indexes,
+    set_indexes,
+)
+
+# bench-index 每個欄位抽樣查詢的值的數量
+BENCH_SAMPLE = 20
+
+
+class ToolError(Exception):
+    """命令執行失敗, 訊息會輸出到 stderr"""
+
+
+def _check_cdb(path: str):
+    if not os.path.isfile(path):
+        raise ToolError(f"找不到文件 {path}")
+
+
+# .cdb 以外的檔案依副檔名交給 CardIO, 回傳是否為 cdb
+def _is_cdb_path(path: str) -> bool:
+    if os.path.splitext(path)[1].lower() == ".cdb":
+        return True
+    try:
+        CardIO.get_format(path)
+    except ValueError as e:
+        raise ToolError(str(e))
+    return False
+
+
+def _parse_expr(expr: str) -> list[Cond]:
+    if not expr:
+        return []
+    try:
+        return parse_filter(expr, load_cardinfo())
+    except ValueError as e:
+        raise ToolError(str(e))
+
+
+# 以 ATTACH 將 src 中 where 篩選出的卡複製到 dst, 回傳複製的數量
+def _copy_cards(src: str, dst: str, where: str, params: list[int], replace: bool) -> int:
+    if not os.path.exists(dst):
+        creat_new_cdb(dst)
+    verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+    id_sql = f"SELECT id FROM src.datas {where}"
+    conn = sqlite3.connect(dst)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (src,))
+        with conn:
+            before = conn.total_changes
+            conn.execute(f"{verb} INTO datas SELECT * FROM src.datas {where}", params)
+            copy_ct = conn.total_changes - before
+            conn.execute(
+                f"{verb} INTO texts SELECT * FROM src.texts WHERE id IN ({id_sql})",
+                params,
+            )
+        conn.execute("DETACH DATABASE src")
+    finally:
+        conn.close()
+    return copy_ct
+
+
+# ---------------- 子命令 ----------------
+def cmd_query(args) -> int:
+    _check_cdb(args.cdb)
+    where, params = cond_to_sql(_parse_expr(args.expr))
+    if args.name:
+        where += " AND " if where else "WHERE "
+        where += "instr(lower(texts.name), lower(?)) > 0"
+        params.append(args.name)
+    sql = f"SELECT id, texts.name FROM datas LEFT JOIN texts USING(id) {where} ORDER BY id"
+    if args.limit:
+        sql += f" LIMIT {int(args.limit)}"
+    conn = sqlite3.connect(args.cdb)
+    try:
+        if args.count:
+            print(conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0])
+            return 0
+        for id, name in conn.execute(sql, params):
+            print(f"{id}\t{name or ''}")
+    finally:
+        conn.close()
+    return 0
+
+
+def cmd_export(args) -> int:
+    _check_cdb(args.cdb)
+    where, params = cond_to_sql(_parse_expr(args.expr))
+    if _is_cdb_path(args.out):
+        copy_ct = _copy_cards(args.cdb, args.out, where, params, True)
+    else:
+        copy_ct = CardIO.export_file(args.cdb, args.out, where, params)
+    print(f"已导出 {copy_ct} 张卡片到 {args.out}")
+    return 0
+
+
+def cmd_import(args) -> int:
+    _check_cdb(args.cdb)
+    _check_cdb(args.src)
+    if _is_cdb_path(args.src):
+        copy_ct = _copy_cards(args.src, args.cdb, "", [], not args.skip_existing)
+    else:
+        try:
+            copy_ct = CardIO.import_file(args.cdb, args.src, not args.skip_existing)
+        except ValueError as e:
+            raise ToolError(f"{args.src}: {e}")
+    print(f"已导入 {copy_ct} 张卡片到 {args.cdb}")
+    return 0
+
+
+def cmd_merge(args) -> int:
+    _check_cdb(args.cdb)
+    _check_cdb(args.theirs)
+    diff = diff_cdb(args.cdb, args.theirs)
+    print(diff.summary())
+    if args.dry_run:
+        for d in diff.added + diff.removed:
+            print(f"{d.id}\t{'仅对方' if d.ours is None else '仅本地'}")
+        for d in diff.changed:
+            print(d.describe())
+        return 0
+
+    # 逐一在終端詢問, q 之後其餘的卡保留本地
+    quit = False
+
+    def choose(d: CardDiff) -> bool:
+        nonlocal quit
+        if quit:
+            return False
+        print(d.describe())
+        ans = input("使用对方的内容? [y/N/q] ").strip().lower()
+        quit = ans == "q"
+        return ans == "y"
+
+    card_lst = plan_merge(diff, args.policy, choose)
+    merge_ct = merge_into_file(args.cdb, card_lst)
+    print(f"已合并 {merge_ct} 张卡片")
+    return 0
+
+
+def cmd_validate(args) -> int:
+    rules = CardRules(load_cardinfo())
+    problem_ct = 0
+    for path in args.cdb:
+        _check_cdb(path)
+        conn = sqlite3.connect(path)
+        try:
+            msg_lst = [r[0] for r in conn.execute("PRAGMA quick_check") if r[0] != "ok"]
+        finally:
+            conn.close()
+        if not msg_lst:
+            report = format_report(validate_file(rules, path), args.limit or sys.maxsize)
+            msg_lst = report.splitlines()
+        for msg in msg_lst:
+            print(f"{path}: {msg}")
+        problem_ct += len(msg_lst)
+    return 1 if problem_ct else 0
+
+
+def cmd_stats(args) -> int:
+    _check_cdb(args.cdb)
+    info = load_cardinfo()
+    conn = sqlite3.connect(args.cdb)
+    try:
+        card_ct = conn.execute("SELECT COUNT(*) FROM datas").fetchone()[0]
+        text_ct = conn.execute("SELECT COUNT(*) FROM texts").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_ct = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_ct = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        print(f"文件\t{args.cdb}")
+        print(f"大小\t{os.path.getsize(args.cdb)} bytes ({page_ct} 页, 空闲 {free_ct} 页, 每页 {page_size})")
+        print(f"卡片\t{card_ct}")
+        print(f"文本\t{text_ct}")
+        title, typ_dict, _ = info.get_key("typ")
+        for label, sub_key in typ_dict.items():
+            value = int(info.get_key(sub_key)[2], 0)
+            ct = conn.execute(
+                "SELECT COUNT(*) FROM datas WHERE (type & ?) = ?", (value, value)
+            ).fetchone()[0]
+            print(f"{title}-{label}\t{ct}")
+    finally:
+        conn.close()
+    return 0
+
+
+def cmd_compact(args) -> int:
+    _check_cdb(args.cdb)
+    cdb = CDB(args.cdb, lazy_text=True, wal=False)
+    if cdb.load_error:
+        raise ToolError(f"读取失败: {cdb.load_error}")
+    try:
+        if not cdb.compact():
+            raise ToolError("整理失败")
+    finally:
+        cdb.close()
+    print(f"已整理 {len(cdb.card_dict)} 张卡片")
+    return 0
+
+
+def cmd_index(args) -> int:
+    _check_cdb(args.cdb)
+    conn = sqlite3.connect(args.cdb)
+    try:
+        if not args.columns and not args.clear:
+            print(" ".join(get_indexes(conn)) or "没有索引")
+            return 0
+        try:
+            with conn:
+                added, dropped = set_indexes(conn, args.columns)
+        except ValueError as e:
+            raise ToolError(str(e))
+    finally:
+        conn.close()
+    print(f"新建索引: {' '.join(added) or '无'}")
+    print(f"删除索引: {' '.join(dropped) or '无'}")
+    return 0
+
+
+# 以 = 查詢 samples 中每個值 repeat 次, 回傳各值平均查詢毫秒數的中位數
+# 用中位數避免 0 這類幾乎所有卡都符合的值主導結果
+def _bench_query(conn: sqlite3.Connection, col: str, samples: list, repeat: int) -> float:
+    sql = f'SELECT id FROM datas WHERE "{col}" = ?'
+    ms_lst = []
+    for value in samples:
+        st = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, (value,)).fetchall()
+        ms_lst.append((time.perf_counter() - st) * 1000 / repeat)
+    return statistics.median(ms_lst) if ms_lst else 0.0
+
+
+def _db_size(conn: sqlite3.Connection) -> int:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_size * conn.execute("PRAGMA page_count").fetchone()[0]
+
+
+def cmd_bench_index(args) -> int:
+    _check_cdb(args.cdb)
+    try:
+        columns = check_index_columns(args.columns or INDEX_COLUMNS)
+    except ValueError as e:
+        raise ToolError(str(e))
+    # 複製到記憶體中比較, 不修改原檔, 也不受磁碟快取影響
+    conn = sqlite3.connect(":memory:")
+    src = sqlite3.connect(args.cdb)
+    try:
+        src.backup(conn)
+    finally:
+        src.close()
+    try:
+        drop_indexes(conn, get_indexes(conn))
+        conn.execute("VACUUM")
+        bare_size = _db_size(conn)
+        samples = {
+            col: [
+                r[0]
+                for r in conn.execute(
+                    f'SELECT DISTINCT "{col}" FROM datas ORDER BY random() LIMIT ?',
+                    (BENCH_SAMPLE,),
+                )
+            ]
+            for col in columns
+        }
+        bare = {col: _bench_query(conn, col, samples[col], args.repeat) for col in columns}
+        create_indexes(conn, columns)
+        index_size = _db_size(conn) - bare_size
+        print("栏位	无索引 ms	有索引 ms	倍数")
+        for col in columns:
+            indexed = _bench_query(conn, col, samples[col], args.repeat)
+            print(f"{col}	{bare[col]:.3f}	{indexed:.3f}	{bare[col] / max(indexed, 1e-9):.1f}x")
+        print(f"索引大小	{index_size // 1024} KB")
+    finally:
+        conn.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="CdbTool", description="cdb 命令列工具")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("query", help="以条件筛选卡片, 输出 id 与名称")
+    p.add_argument("cdb")
+    p.add_argument("expr", nargs="?", default="", help='例如 "类型=部队 战力>=3000"')
+    p.add_argument("--name", help="名称包含的文字")
+    p.add_argument("--limit", type=int, default=0)
+    p.add_argument("--count", action="store_true", help="只输出数量")
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser("export", help="将符合条件的卡片导出到 cdb, csv 或 jsonl")
+    p.add_argument("cdb")
+    p.add_argument("out")
+    p.add_argument("expr", nargs="?", default="")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="将 cdb, csv 或 jsonl 的卡片导入 cdb")
+    p.add_argument("cdb")
+    p.add_argument("src")
+    p.add_argument("--skip-existing", action="store_true", help="不覆盖已存在的 id")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("merge", help="将 theirs 合并到 cdb")
+    p.add_argument("cdb")
+    p.add_argument("theirs")
+    p.add_argument("--policy", choices=list(MERGE_POLICIES), default="ours")
+    p.add_argument("--dry-run", action="store_true", help="只列出差异")
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser("validate", help="检查 cdb 及卡片内容是否符合 cardinfo, 有问题时返回 1")
+    p.add_argument("cdb", nargs="+")
+    p.add_argument("--limit", type=int, default=20, help="每项最多列出的 id 数, 0 为全部")
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("stats", help="统计 cdb")
+    p.add_argument("cdb")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("compact", help="按 ID 顺序重写并整理 cdb")
+    p.add_argument("cdb")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("index", help="设定 datas 的次要索引, 不指定栏位时列出现有索引")
+    p.add_argument("cdb")
+    p.add_argument("columns", nargs="*", help=f"例如 {' '.join(INDEX_COLUMNS)}")
+    p.add_argument("--clear", action="store_true", help="删除所有索引")
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser("bench-index", help="比较有无索引时按栏位查询的速度, 不修改文件")
+    p.add_argument("cdb")
+    p.add_argument("columns", nargs="*")
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_bench_index)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except ToolError as e:
+        print(e, file=sys.stderr)
+    except sqlite3.Error as e:
+        print(f"数据库错误: {e}", file=sys.stderr)
+    except BrokenPipeError:
+        # 輸出被 head 等程式提前關閉, 避免結束時再次寫入 stdout
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,17 @@
 import os
 import json
-from Global import PATH_CARDINFO, PATH_CONFIG
+from Global import PATH_CARDINFO, PATH_CONFIG, SQL_DATA_KEYS
 
-DEFAULT_CONFIG = {"DATABASE_HISTORY": {"max_record": 10, "history_paths": []}}
+DEFAULT_CONFIG = {
+    "DATABASE_HISTORY": {"max_record": 10, "history_paths": []},
+    "DATABASE_OPTION": {
+        "lazy_text": False,
+        "text_cache_size": 256,
+        "snapshot_cache": True,
+        "index_columns": [],
+        "working_copy": False,
+    },
+}
 
 
 # ---------------- CardInfo ----------------
@@ -81,6 +90,15 @@ def load_config() -> dict:
         return DEFAULT_CONFIG
 
 
+def get_db_option(config: dict) -> dict:
+    """回傳資料庫選項, 缺少的欄位以預設值補上, 忽略不是 datas 欄位的索引"""
+    option = dict(DEFAULT_CONFIG["DATABASE_OPTION"])
+    option.update(config.get("DATABASE_OPTION", {}))
+    data_keys = SQL_DATA_KEYS.split(",")
+    option["index_columns"] = [c for c in option["index_columns"] if c in data_keys]
+    return option
+
+
 def save_config(config: dict):
     """將當前配置儲存到配置檔"""
     try:
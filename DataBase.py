@@ -1,22 +1,265 @@
+import os
+import sys
+import shutil
 import sqlite3
-from Global import get_sql_code_data, get_sql_code_text
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Iterable, Iterator
+from AliasGraph import AliasGraph
+from TextIndex import TextIndex
+from UndoJournal import UndoJournal
+from SnapshotCache import snapshot_key, read_snapshot, write_snapshot
+from CardFilter import Cond, eval_filter
+from Global import (
+    get_sql_code_data,
+    get_sql_code_text,
+    get_sql_code_load,
+    SQL_DATA_KEYS,
+    SQL_TEXT_KEYS,
+)
 
-sql_set_datas, sql_insert_datas = get_sql_code_data()
-sql_set_texts, sql_insert_texts = get_sql_code_text()
+sql_set_datas, sql_insert_datas, sql_replace_datas = get_sql_code_data()
+sql_set_texts, sql_insert_texts, sql_replace_texts = get_sql_code_text()
+sql_load_cards = get_sql_code_load()
+sql_load_names = get_sql_code_load("name")
+# 以 id 讀取部分卡片, {} 填入參數標記
+sql_load_cards_in = get_sql_code_load(where="WHERE datas.id IN ({})")
+sql_load_names_in = get_sql_code_load("name", "WHERE datas.id IN ({})")
+sql_get_text = "SELECT * FROM texts WHERE id = ?"
+sql_delete_datas = "DELETE FROM datas WHERE id = ?"
+sql_delete_texts = "DELETE FROM texts WHERE id = ?"
+sql_orphan_datas = "SELECT id FROM datas WHERE id NOT IN (SELECT id FROM texts)"
+sql_orphan_texts = "SELECT id FROM texts WHERE id NOT IN (SELECT id FROM datas)"
+sql_data_version = "PRAGMA data_version"
 
+# 讀取卡片時每批從 cursor 取出的列數
+LOAD_ARRAYSIZE = 2048
+# 以 WHERE id IN (...) 查詢時每批的 id 數
+QUERY_CHUNK = 500
+# 編輯用連線的設定: WAL 讓讀寫互不阻塞, 較大的快取與 mmap 減少讀檔
+CONN_PRAGMAS: list[str] = [
+    "journal_mode = WAL",
+    "synchronous = NORMAL",
+    "cache_size = -65536",
+    "mmap_size = 268435456",
+    "temp_store = MEMORY",
+]
+# 命令列工具的寫入連線: journal 模式記錄在檔案中, 不設定以保持檔案原本的模式
+BATCH_PRAGMAS: list[str] = [
+    p for p in CONN_PRAGMAS if not p.startswith(("journal_mode", "synchronous"))
+]
+# 每個連線快取的預備語句數
+CACHED_STATEMENTS = 256
+# datas 表的欄位, 也是 CardStore 欄位陣列的順序
+DATA_KEYS: list[str] = ["id", *SQL_DATA_KEYS.split(",")]
+# 匯出與比較用的一列 (完整列): datas 全欄 + texts 除 id 外的全欄
+TEXT_KEYS: list[str] = SQL_TEXT_KEYS.split(",")
+ROW_KEYS: list[str] = DATA_KEYS + TEXT_KEYS
+_DATA_CT = len(DATA_KEYS)
+_EMPTY_TEXT = ("",) * len(TEXT_KEYS)
+# 脚本提示文字的數量
+HINT_CT = 16
+# 建議建立次要索引的 datas 欄位, 依此篩選的查詢不需掃描整個表
+INDEX_COLUMNS: list[str] = ["type", "race", "attribute", "alias", "setcode"]
+# 由編輯器管理的索引名稱前綴, 其他名稱的索引不會被修改
+INDEX_PREFIX = "idx_datas_"
 
-# 建立新的 CDB 資料庫檔案, 包含 datas 與 texts 兩個表
-def creat_new_cdb(file_path: str):
+
+# 建立新的 CDB 資料庫檔案, 包含 datas 與 texts 兩個表, 以及 index_columns 的索引
+def creat_new_cdb(file_path: str, index_columns: Iterable[str] = ()):
     conn = sqlite3.connect(file_path)
     cursor = conn.cursor()
     # 建立 data & texts 表
     cursor.execute(sql_set_datas)
     cursor.execute(sql_set_texts)
+    create_indexes(conn, index_columns)
     conn.commit()
     conn.close()
 
 
+def check_index_columns(columns: Iterable[str]) -> list[str]:
+    """檢查並去除重複的索引欄位, 只能是 id 以外的 datas 欄位, 否則丟出 ValueError"""
+    res_lst = []
+    for col in columns:
+        if col not in DATA_KEYS[1:]:
+            raise ValueError(f"无法为 {col} 建立索引, 可用 {', '.join(DATA_KEYS[1:])}")
+        if col not in res_lst:
+            res_lst.append(col)
+    return res_lst
+
+
+def get_indexes(conn: sqlite3.Connection) -> list[str]:
+    """回傳 datas 上由編輯器管理的索引欄位, 名稱不是 INDEX_PREFIX + 欄位名的索引不算在內"""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'datas'"
+    )
+    name_lst = [f"{INDEX_PREFIX}{col}" for col in DATA_KEYS[1:]]
+    return [name[len(INDEX_PREFIX) :] for name, in rows if name in name_lst]
+
+
+def create_indexes(conn: sqlite3.Connection, columns: Iterable[str]):
+    """建立 columns 中尚不存在的索引"""
+    for col in check_index_columns(columns):
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{INDEX_PREFIX}{col}" ON datas("{col}")')
+
+
+def drop_indexes(conn: sqlite3.Connection, columns: Iterable[str]):
+    """刪除 columns 中由編輯器管理的索引"""
+    for col in columns:
+        conn.execute(f'DROP INDEX IF EXISTS "{INDEX_PREFIX}{col}"')
+
+
+def set_indexes(conn: sqlite3.Connection, columns: Iterable[str]) -> tuple[list[str], list[str]]:
+    """
+    讓編輯器管理的索引剛好是 columns, 回傳 (新建的欄位, 刪除的欄位)
+    欄位不正確時丟出 ValueError, 不會修改任何索引
+    """
+    want = check_index_columns(columns)
+    have = get_indexes(conn)
+    added = [col for col in want if col not in have]
+    dropped = [col for col in have if col not in want]
+    drop_indexes(conn, dropped)
+    create_indexes(conn, added)
+    return added, dropped
+
+
+def open_cdb_conn(path: str, wal: bool = True) -> sqlite3.Connection:
+    """
+    開啟編輯用的長連線並套用 CONN_PRAGMAS, 唯讀媒體等不支援的設定會被略過
+    wal 為 False 時改用 BATCH_PRAGMAS, 不把檔案轉為 WAL 模式
+    連線可交給背景執行緒寫入, 呼叫端需以 CDB.lock 保護
+    """
+    conn = sqlite3.connect(
+        path, cached_statements=CACHED_STATEMENTS, check_same_thread=False
+    )
+    for pragma in CONN_PRAGMAS if wal else BATCH_PRAGMAS:
+        try:
+            conn.execute(f"PRAGMA {pragma}")
+        except sqlite3.Error:
+            pass
+    return conn
+
+
+def load_working_copy(path: str) -> sqlite3.Connection:
+    """以 backup 將 path 整個複製到 :memory: 並回傳可交給背景執行緒使用的連線"""
+    conn = sqlite3.connect(
+        ":memory:", cached_statements=CACHED_STATEMENTS, check_same_thread=False
+    )
+    src = sqlite3.connect(path)
+    try:
+        src.backup(conn)
+    finally:
+        src.close()
+    return conn
+
+
+def flush_working_copy(conn: sqlite3.Connection, path: str):
+    """
+    以 backup 將記憶體中的資料庫寫到同目錄的暫存檔, 再以 os.replace 整個取代 path
+    backup 會照抄檔頭記錄的 WAL 模式, 寫完後改回 rollback journal, 讀取端不會建立 -wal
+    中途失敗時 path 保持原樣, 其他程式有尚未寫回主檔的 WAL 時不寫入, 失敗時丟出 sqlite3.Error
+    """
+    tmp_path = path + ".tmp"
+    try:
+        if os.path.exists(path + "-wal") and os.path.getsize(path + "-wal"):
+            raise sqlite3.OperationalError("文件正被其他程序使用, 未写入")
+        for p in (tmp_path, tmp_path + "-journal"):
+            if os.path.exists(p):
+                os.remove(p)
+        dst = sqlite3.connect(tmp_path)
+        try:
+            conn.backup(dst)
+            dst.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            dst.close()
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except (OSError, sqlite3.Error) as e:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        if isinstance(e, sqlite3.Error):
+            raise
+        raise sqlite3.OperationalError(f"写入文件失败: {e}") from e
+
+
+def is_id_text(text: str) -> bool:
+    """text 是否為只含半形數字的 id 或 id 前綴"""
+    return text.isascii() and text.isdigit()
+
+
+def parse_id_range(text: str) -> tuple[int, int] | None:
+    """解析 "起始-結束" 的 id 區間, 起訖顛倒時交換, 格式不符時回傳 None"""
+    id_st, sep, id_ed = text.partition("-")
+    if not sep or not is_id_text(id_st) or not is_id_text(id_ed):
+        return None
+    id_st, id_ed = int(id_st), int(id_ed)
+    return (id_st, id_ed) if id_st <= id_ed else (id_ed, id_st)
+
+
+def iter_card_rows(
+    conn: sqlite3.Connection,
+    arraysize: int = LOAD_ARRAYSIZE,
+    lazy: bool = False,
+    where: str = "",
+    params: Iterable = (),
+):
+    """
+    以 datas LEFT JOIN texts 串流讀取卡片, 每次產出一批列
+    每列前 11 欄為 datas, 後面為 texts (沒有對應 texts 時全為 None), 各批依 id 排序
+    lazy 為 True 時 texts 只讀取 id 與 name, where 為附加的 WHERE 子句
+    """
+    cursor = conn.cursor()
+    cursor.arraysize = arraysize
+    if where:
+        sql = get_sql_code_load("name" if lazy else SQL_TEXT_KEYS, where)
+        cursor.execute(sql, list(params))
+    else:
+        cursor.execute(sql_load_names if lazy else sql_load_cards)
+    while rows := cursor.fetchmany():
+        yield rows
+
+
+def iter_full_rows(
+    conn: sqlite3.Connection, where: str = "", params: Iterable = ()
+) -> Iterator[tuple]:
+    """依 id 順序串流產出 ROW_KEYS 順序的完整列, 沒有 texts 或欄位為 NULL 時文本為空字串"""
+    for rows in iter_card_rows(conn, where=where, params=params):
+        for row in rows:
+            if row[_DATA_CT] is None:
+                yield row[:_DATA_CT] + _EMPTY_TEXT
+                continue
+            text = row[_DATA_CT + 1 :]
+            if None in text:
+                text = tuple(t or "" for t in text)
+            yield row[:_DATA_CT] + text
+
+
 class Card:
+    __slots__ = (
+        "id",
+        "ot",
+        "alias",
+        "setcode",
+        "type",
+        "atk",
+        "def_",
+        "level",
+        "race",
+        "attribute",
+        "category",
+        "name",
+        "desc",
+        "strs",
+        "text_loaded",
+    )
     id: int
     ot: int
     alias: int
@@ -31,6 +274,7 @@ class Card:
     name: str
     desc: str
     strs: list[str]
+    text_loaded: bool
 
     def __init__(self, id: int):
         self.id = id
@@ -47,118 +291,1310 @@ class Card:
         self.name = ""
         self.desc = ""
         self.strs = []
+        self.text_loaded = True
 
     def set_data(self, data: list[int]):
+        self.ot = data[1]
         self.alias = data[2]
+        self.setcode = data[3]
         self.type = data[4]
         self.atk = data[5]
         self.def_ = data[6]
         self.level = data[7]
         self.race = data[8]
         self.attribute = data[9]
+        self.category = data[10]
 
     def set_text(self, text: list[str]):
         self.name = text[1]
         self.desc = text[2]
         self.strs = text[3:]
+        self.text_loaded = True
+
+    def get_search_text(self) -> str:
+        """回傳 name, desc 與 strs 合併後的文本, 供全文搜索使用"""
+        return "\n".join([self.name or "", self.desc or "", *self.strs])
+
+    def get_data_row(self) -> tuple:
+        """回傳寫入 datas 表的一列"""
+        return (
+            self.id,
+            self.ot,
+            self.alias,
+            self.setcode,
+            self.type,
+            self.atk,
+            self.def_,
+            self.level,
+            self.race,
+            self.attribute,
+            self.category,
+        )
+
+    def get_text_row(self) -> tuple:
+        """回傳寫入 texts 表的一列, 提示文字補齊 / 截斷為 16 條"""
+        hints = list(self.strs[:HINT_CT])
+        if len(hints) < HINT_CT:
+            hints += [""] * (HINT_CT - len(hints))
+        return (int(self.id), self.name or "", self.desc or "", *hints)
+
+
+def full_row_to_card(row: tuple) -> Card:
+    """將 ROW_KEYS 順序的完整列轉為 Card"""
+    c = Card(row[0])
+    c.set_data(list(row[:_DATA_CT]))
+    c.set_text([row[0], *row[_DATA_CT:]])
+    return c
+
+
+def row_version(row: tuple) -> int:
+    """
+    iter_card_rows 產出的一列的版本值, 內容相同的列版本相同
+    以內建 hash 計算, 只在同一個行程內比較, 不可寫入檔案
+    """
+    return hash(row)
+
+
+# 去掉結尾的空字串並駐留字串, 全部為空時回傳空 tuple
+def pack_hints(hints: Iterable[str | None]) -> tuple[str, ...]:
+    hint_lst = list(hints)[:HINT_CT]
+    end = len(hint_lst)
+    while end and not hint_lst[end - 1]:
+        end -= 1
+    return tuple(sys.intern(h) if h else "" for h in hint_lst[:end])
+
+
+class CardStore(MutableMapping):
+    """
+    以欄位陣列保存卡片, 用法與 dict[int, Card] 相同
+    datas 的各欄存在 array 中, 列號由 id_row 對應, 刪除時以最後一列補位
+    脚本提示只保存有內容的卡, desc 為 None 表示 lazy_text 模式尚未載入文本
+    versions 為各列最後一次與資料庫同步時的 row_version, 新增且尚未寫入的列為 0
+    取出的 Card 是當下資料的副本, 修改後需以 store[id] = card 寫回
+    """
+
+    id_row: dict[int, int]
+    data_col: list[array]
+    names: list[str]
+    descs: list[str | None]
+    hints: dict[int, tuple[str, ...]]
+    versions: array
+
+    def __init__(self):
+        self.id_row = {}
+        self.data_col = [array("q") for _ in DATA_KEYS]
+        self.names = []
+        self.descs = []
+        self.hints = {}
+        self.versions = array("q")
+
+    # ---------------- Mapping ----------------
+    def __len__(self) -> int:
+        return len(self.id_row)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.id_row)
+
+    def __contains__(self, id) -> bool:
+        return id in self.id_row
+
+    def __getitem__(self, id: int) -> Card:
+        row = self.id_row[id]
+        c = Card(id)
+        c.set_data([col[row] for col in self.data_col])
+        c.name = self.names[row]
+        if (desc := self.descs[row]) is None:
+            c.text_loaded = False
+        else:
+            c.desc = desc
+            hints = list(self.hints.get(id, ()))
+            c.strs = hints + [""] * (HINT_CT - len(hints))
+        return c
+
+    def __setitem__(self, id: int, c: Card):
+        values = c.get_data_row()
+        if (row := self.id_row.get(id)) is None:
+            self.id_row[id] = len(self.names)
+            for col, value in zip(self.data_col, values):
+                col.append(value)
+            self.names.append(c.name or "")
+            self.descs.append((c.desc or "") if c.text_loaded else None)
+            self.versions.append(0)
+        else:
+            for col, value in zip(self.data_col, values):
+                col[row] = value
+            self.names[row] = c.name or ""
+            self.descs[row] = (c.desc or "") if c.text_loaded else None
+        if c.text_loaded:
+            self._set_hints(id, c.strs)
+
+    def __delitem__(self, id: int):
+        row = self.id_row.pop(id)
+        last = len(self.names) - 1
+        if row != last:
+            # 最後一列移到被刪除的位置
+            for col in self.data_col:
+                col[row] = col[last]
+            self.names[row] = self.names[last]
+            self.descs[row] = self.descs[last]
+            self.versions[row] = self.versions[last]
+            self.id_row[self.data_col[0][row]] = row
+        for col in self.data_col:
+            col.pop()
+        self.names.pop()
+        self.descs.pop()
+        self.versions.pop()
+        self.hints.pop(id, None)
+
+    # ---------------- 批量載入 ----------------
+    def append_rows(self, rows: list[tuple], lazy: bool = False) -> list[int]:
+        """
+        加入一批 iter_card_rows 的列, 回傳沒有對應 texts 的 id
+        lazy 為 True 時列中只有 name, desc 與 strs 標記為未載入
+        各列的 row_version 記錄在 versions
+        """
+        if not rows:
+            return []
+        base = len(self.names)
+        self.versions.extend(map(row_version, rows))
+        cols = list(zip(*rows))
+        for col, values in zip(self.data_col, cols[:11]):
+            if None in values:
+                values = [v or 0 for v in values]
+            col.extend(values)
+        ids = cols[0]
+        self.id_row.update(zip(ids, range(base, base + len(ids))))
+        self.names.extend(name or "" for name in cols[12])
+        if lazy:
+            self.descs.extend([None] * len(ids))
+        else:
+            self.descs.extend(desc or "" for desc in cols[13])
+            for row in rows:
+                if any(row[14:]):
+                    self.hints[row[0]] = pack_hints(row[14:])
+        return [id for id, text_id in zip(ids, cols[11]) if text_id is None]
+
+    # ---------------- 欄位存取 ----------------
+    def column(self, key: str) -> array:
+        """回傳 datas 欄位 key 的陣列, 順序與 column("id") 相同, 呼叫端不可修改"""
+        return self.data_col[DATA_KEYS.index(key)]
+
+    def get_name(self, id: int) -> str:
+        return self.names[self.id_row[id]]
+
+    def get_alias(self, id: int) -> int:
+        return self.column("alias")[self.id_row[id]]
+
+    def iter_names(self) -> Iterator[tuple[int, str]]:
+        """產出所有 (id, name)"""
+        return zip(self.data_col[0], self.names)
+
+    def is_text_loaded(self, id: int) -> bool:
+        return self.descs[self.id_row[id]] is not None
+
+    def set_text(self, id: int, text: tuple):
+        """以 texts 表的一列設定 id 的文本"""
+        row = self.id_row[id]
+        self.names[row] = text[1] or ""
+        self.descs[row] = text[2] or ""
+        self._set_hints(id, text[3:])
+
+    def drop_text(self, id: int):
+        """釋放 id 的 desc 與 strs, 之後需重新載入"""
+        self.descs[self.id_row[id]] = None
+        self.hints.pop(id, None)
+
+    def _set_hints(self, id: int, hints: Iterable[str | None]):
+        if packed := pack_hints(hints):
+            self.hints[id] = packed
+        else:
+            self.hints.pop(id, None)
+
+    def get_version(self, id: int) -> int:
+        return self.versions[self.id_row[id]]
+
+    def set_version(self, id: int, version: int):
+        self.versions[self.id_row[id]] = version
+
+    def get_load_row(self, id: int, lazy: bool = False) -> tuple:
+        """
+        回傳此卡寫入後 iter_card_rows 會讀到的列, 用於計算 row_version
+        lazy 為 True 時 texts 部分只有 id 與 name, 否則文本需已載入
+        """
+        if lazy:
+            return (*self.get_data_row(id), id, self.get_name(id))
+        return self.get_data_row(id) + self.get_text_row(id)
+
+    def get_data_row(self, id: int) -> tuple:
+        """回傳寫入 datas 表的一列"""
+        row = self.id_row[id]
+        return tuple(col[row] for col in self.data_col)
+
+    def get_text_row(self, id: int) -> tuple:
+        """回傳寫入 texts 表的一列, 文本需已載入"""
+        row = self.id_row[id]
+        hints = self.hints.get(id, ())
+        pad = ("",) * (HINT_CT - len(hints))
+        return (id, self.names[row], self.descs[row] or "", *hints, *pad)
+
+    def get_search_text(self, id: int) -> str:
+        """回傳 name, desc 與 strs 合併後的文本, 文本需已載入"""
+        row = self.id_row[id]
+        return "\n".join([self.names[row], self.descs[row] or "", *self.hints.get(id, ())])
+
+    # ---------------- 快照 ----------------
+    def compute_versions(self, lazy: bool = False) -> array:
+        """
+        以記憶體中的資料重新計算每列的 row_version, 順序與 versions 相同
+        資料庫中有 NULL 或缺少 texts 的列與記憶體中的值不同, 算出的版本也會不同
+        """
+        cols = self.data_col
+        if lazy:
+            return array("q", map(row_version, zip(*cols, cols[0], self.names)))
+        hints = self.hints
+        pads = [("",) * (HINT_CT - ct) for ct in range(HINT_CT + 1)]
+        versions = array("q")
+        for row in zip(*cols, cols[0], self.names, self.descs):
+            hint = hints.get(row[0], ())
+            versions.append(row_version(row + hint + pads[len(hint)]))
+        return versions
+
+    def dump(self, lazy: bool = False) -> tuple:
+        """
+        回傳可由 marshal 寫入的內容, versions 依賴行程內的 hash 所以不包含
+        lazy 為 True 時不包含 desc 與 strs
+        """
+        cols = [col.tobytes() for col in self.data_col]
+        if lazy:
+            return (cols, self.names, None, {})
+        return (cols, self.names, self.descs, self.hints)
+
+    @classmethod
+    def restore(cls, state: tuple) -> "CardStore":
+        """以 dump 的內容建立 CardStore, versions 需由呼叫端設定, 內容不符時丟出 ValueError"""
+        cols, names, descs, hints = state
+        store = cls()
+        if len(cols) != len(store.data_col):
+            raise ValueError("快照欄位數不符")
+        for col, raw in zip(store.data_col, cols):
+            col.frombytes(raw)
+        row_ct = len(names)
+        if any(len(col) != row_ct for col in store.data_col):
+            raise ValueError("快照列數不符")
+        store.id_row = dict(zip(store.data_col[0], range(row_ct)))
+        store.names = names
+        store.descs = [None] * row_ct if descs is None else descs
+        store.hints = hints
+        return store
+
+
+class ChangeSet:
+    """
+    CDB.take_changes 取出的一批待寫入修改, 寫入失敗時 error 為錯誤訊息
+    bases 為取出時各 id 在資料庫中應有的 row_version, versions 為寫入後的 row_version,
+    刪除與不存在的列版本為 0
+    寫入時資料庫中的版本與 bases 不同的 id 不會寫入, 記錄在 conflicts (id -> 資料庫中的版本)
+    """
+
+    data_rows: list[tuple]
+    text_rows: list[tuple]
+    del_ids: list[int]
+    bases: dict[int, int]
+    versions: dict[int, int]
+    conflicts: dict[int, int]
+    error: str
+
+    def __init__(
+        self,
+        data_rows: list[tuple],
+        text_rows: list[tuple],
+        del_ids: list[int],
+        bases: dict[int, int] | None = None,
+        versions: dict[int, int] | None = None,
+    ):
+        self.data_rows = data_rows
+        self.text_rows = text_rows
+        self.del_ids = del_ids
+        self.bases = bases or {}
+        self.versions = versions or {}
+        self.conflicts = {}
+        self.error = ""
+
+    def is_empty(self) -> bool:
+        return not (self.data_rows or self.del_ids)
 
 
 class CDB:
+    read_only: bool = False
     path: str
-    card_dict: dict[int, Card]
+    conn: sqlite3.Connection | None
+    lock: threading.RLock
+    schema_ok: bool
+    working_copy: bool
+    wal: bool
+    index_columns: list[str]
+    change_listener: Callable[[], None] | None
+    card_dict: CardStore
+    sorted_id_lst: list[int]
     now_id: int
-    show_id_lst: list[int]
+    _show_id_lst: list[int]
+    _show_pos: dict[int, int] | None
     select_id_lst: set[int]
+    dirty_id_set: set[int]
+    deleted_id_set: set[int]
+    deleted_versions: dict[int, int]
+    conflicts: dict[int, int]
+    orphan_data_ids: list[int]
+    orphan_text_ids: list[int]
+    load_error: str
+    lazy_text: bool
+    text_cache: OrderedDict[int, None]
+    text_cache_size: int
+    name_index: TextIndex | None
+    text_index: TextIndex | None
+    index_listener: Callable[[str], None] | None
+    index_builds: dict[str, set[int]]
+    alias_graph: AliasGraph | None
+    data_version: int
+    file_id: tuple[int, ...] | None
+    journal: UndoJournal
 
-    def __init__(self, path: str):
+    def __init__(
+        self,
+        path: str,
+        lazy_text: bool = False,
+        text_cache_size: int = 256,
+        load: bool = True,
+        index_columns: Iterable[str] = (),
+        working_copy: bool = False,
+        wal: bool = True,
+    ):
         # 初始化
         self.path = path
-        self.card_dict = {}
+        self.conn = None
+        self.lock = threading.RLock()
+        self.schema_ok = False
+        self.working_copy = working_copy
+        self.wal = wal
+        self.index_columns = check_index_columns(index_columns)
+        self.change_listener = None
+        self.lazy_text = lazy_text
+        self.text_cache = OrderedDict()
+        self.text_cache_size = max(1, text_cache_size)
+        self.name_index = None
+        self.text_index = None
+        self.index_listener = None
+        self.index_builds = {}
+        self.alias_graph = None
+        self.card_dict = CardStore()
+        self.sorted_id_lst = []
         self.now_id = 0
-        self.show_id_lst = []
+        self.show_id_lst = self.sorted_id_lst
         self.select_id_lst = set()
-        # 設定 card_dict
-        try:
-            with sqlite3.connect(self.path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM datas")
-                datas = cursor.fetchall()
-                cursor.execute("SELECT * FROM texts")
-                texts = cursor.fetchall()
-            for data, text in zip(datas, texts):
-                card = Card(data[0])
-                card.set_data(data)
-                card.set_text(text)
-                self.card_dict[data[0]] = card
-        except Exception:
+        self.dirty_id_set = set()
+        self.deleted_id_set = set()
+        self.deleted_versions = {}
+        self.conflicts = {}
+        self.orphan_data_ids = []
+        self.orphan_text_ids = []
+        self.load_error = ""
+        self.loading = False
+        self.partial = False
+        self.load_total = 0
+        self.data_version = 0
+        self.file_id = None
+        self.journal = UndoJournal()
+        # 設定 card_dict, load 為 False 時由呼叫端以 begin_load / load_rows 分批載入
+        if load:
+            self.load()
+
+    # ---------------- 顯示列表 ----------------
+    @property
+    def show_id_lst(self) -> list[int]:
+        """當前篩選後顯示的 id 列表"""
+        return self._show_id_lst
+
+    @show_id_lst.setter
+    def show_id_lst(self, id_lst: list[int]):
+        self._show_id_lst = id_lst
+        self._show_pos = None
+
+    def get_show_index(self, id: int) -> int:
+        """
+        回傳 id 在 show_id_lst 中的位置, 不存在時回傳 -1
+        位置表在篩選改變後的第一次查詢時重建
+        """
+        if self._show_pos is None:
+            self._show_pos = {id: i for i, id in enumerate(self._show_id_lst)}
+        return self._show_pos.get(id, -1)
+
+    def show_count(self) -> int:
+        """回傳 show_id_lst 的數量"""
+        return len(self._show_id_lst)
+
+    def get_show_page(self, start: int, count: int) -> list[tuple[int, str]]:
+        """回傳 show_id_lst 中第 start 筆起的 count 筆 (id, name), 供列表分頁顯示"""
+        get_name = self.card_dict.get_name
+        return [(id, get_name(id)) for id in self._show_id_lst[start : start + count]]
+
+    def get_show_ids(self, start: int, stop: int) -> list[int]:
+        """回傳 show_id_lst 中第 start 到 stop - 1 筆的 id"""
+        return self._show_id_lst[start:stop]
+
+    def clear_filter(self):
+        """顯示所有卡片, 保留選中的卡"""
+        self.show_id_lst = self.sorted_id_lst
+
+    # ---------------- 連線 ----------------
+    def get_conn(self) -> sqlite3.Connection:
+        """
+        回傳此 cdb 的長連線, 第一次使用時開啟
+        working_copy 模式下為以 backup 載入整個檔案的 :memory: 資料庫, 寫入後由 _flush_file 寫回
+        """
+        if self.conn is None:
+            if self.working_copy:
+                self.conn = load_working_copy(self.path)
+            else:
+                self.conn = open_cdb_conn(self.path, self.wal)
+        return self.conn
+
+    def open_working_copy(self) -> tuple[sqlite3.Connection, tuple[int, ...] | None]:
+        """
+        以 backup 載入新的 working copy, 回傳 (連線, 載入前的檔案識別), 可在背景執行緒呼叫
+        不改變目前的連線, 由 GUI 執行緒以 set_working_copy 換上
+        """
+        file_id = self._get_file_id()
+        return load_working_copy(self.path), file_id
+
+    def set_working_copy(
+        self,
+        conn: sqlite3.Connection,
+        file_id: tuple[int, ...] | None,
+        replace: bool = True,
+    ):
+        """
+        以 open_working_copy 的結果作為此 cdb 的連線, 之後以 file_id 判斷外部修改
+        replace 為 False 且已開啟連線時保留目前的連線並關閉 conn
+        """
+        with self.lock:
+            if self.conn is not None and not replace:
+                conn.close()
+                return
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = conn
+            self.schema_ok = False
+        self.file_id = file_id
+
+    def _flush_file(self):
+        """
+        working_copy 模式下將記憶體中的資料庫整個寫回 path, 需持有 lock
+        檔案在載入或上次寫回後被其他程式修改時不寫入, 等待 reload_external 重新載入後再寫
+        """
+        if not self.working_copy:
+            return
+        if self._get_file_id() != self.file_id:
+            raise sqlite3.OperationalError("文件已被其他程序修改, 未写入")
+        flush_working_copy(self.conn, self.path)
+        self.file_id = self._get_file_id()
+
+    def _ensure_schema(self, conn: sqlite3.Connection):
+        """第一次寫入前建立 datas 與 texts 表以及 index_columns 的索引, 之後不再檢查"""
+        if not self.schema_ok:
+            conn.execute(sql_set_datas)
+            conn.execute(sql_set_texts)
+            create_indexes(conn, self.index_columns)
+            self.schema_ok = True
+
+    def close(self, snapshot: bool = False):
+        """
+        寫回尚未保存的修改並關閉連線
+        snapshot 為 True 且記憶體與資料庫一致時, 關閉後寫入快照供下次 load_snapshot 使用
+        """
+        if self.conn is None:
+            return
+        self.save()
+        state = self._dump_snapshot() if snapshot else None
+        with self.lock:
+            try:
+                self.conn.close()
+            except sqlite3.Error:
+                pass
+            self.conn = None
+        # 關閉後 WAL 已寫回主檔, 此時的修改時間與大小才是下次開啟時看到的
+        if state is not None and (key := snapshot_key(self.path, self.lazy_text)):
+            write_snapshot(key, state)
+
+    def load(self):
+        """
+        以 id 配對 datas 與 texts 串流載入 card_dict
+        沒有 texts 的 datas 以空文本載入並記錄在 orphan_data_ids,
+        沒有 datas 的 texts 無法成卡, 記錄在 orphan_text_ids
+        lazy_text 模式只載入 name, desc 與 strs 由 load_text 按需讀取
+        """
+        self.begin_load()
+        try:
+            for rows in iter_card_rows(self.get_conn(), lazy=self.lazy_text):
+                self.load_rows(rows)
+        except sqlite3.Error as e:
+            self.load_error = str(e)
+        self.finish_load()
+
+    # ---------------- 分批載入 ----------------
+    def begin_load(self, total: int = 0):
+        """
+        開始分批載入, 載入期間 loading 為 True, 呼叫端不應修改卡片
+        讀取前記錄資料庫版本, 之後其他連線的修改都會被 has_external_change 發現
+        """
+        self.loading = True
+        self.partial = False
+        self.load_total = total
+        try:
+            self._mark_synced()
+        except sqlite3.Error:
             pass
-        # 初始化顯示
-        if self.card_dict:
-            self.show_id_lst = sorted(self.card_dict.keys(), key=lambda k: int(k))
-            self.now_id = self.show_id_lst[0]
+
+    def load_rows(self, rows: list[tuple]):
+        """
+        加入一批 iter_card_rows 產出的列, 並更新 sorted_id_lst
+        第一批載入後 now_id 指向第一張卡, 已建立的文本索引在下次搜尋時重建
+        """
+        if not rows:
+            return
+        self.orphan_data_ids += self.card_dict.append_rows(rows, self.lazy_text)
+        id_lst = [row[0] for row in rows]
+        if not self.sorted_id_lst or id_lst[0] > self.sorted_id_lst[-1]:
+            self._show_pos = None
+            self.sorted_id_lst.extend(id_lst)
+        else:
+            self._index_add_many(id_lst)
+        self.name_index = None
+        self.text_index = None
+        self.index_builds.clear()
+        self.alias_graph = None
+        if self.now_id == 0:
+            self.now_id = self.sorted_id_lst[0]
+            self.select_id_lst.clear()
+            self.select_id_lst.add(self.now_id)
+
+    def finish_load(self):
+        """分批載入完成, 檢查沒有 datas 的 texts"""
+        self.loading = False
+        try:
+            with self.lock:
+                conn = self.get_conn()
+                self.orphan_text_ids = [r[0] for r in conn.execute(sql_orphan_texts)]
+        except sqlite3.Error as e:
+            self.load_error = self.load_error or str(e)
+
+    def cancel_load(self):
+        """中止分批載入, 只保留已載入的卡片, 並標記為 partial"""
+        self.loading = False
+        self.partial = True
+
+    # ---------------- 快照 ----------------
+    def load_snapshot(self) -> bool:
+        """
+        在 begin_load 之後呼叫, 檔案自上次寫入快照後沒有改變時直接還原 card_dict,
+        不需逐列讀取資料庫, 成功時回傳 True, 之後仍需呼叫 finish_load
+        row_version 依賴行程內的 hash, 以還原的資料重新計算,
+        快照中記錄的不規則列 (有 NULL 或缺少 texts) 從資料庫讀取版本
+        """
+        if not self.loading or self.card_dict:
+            return False
+        if (key := snapshot_key(self.path, self.lazy_text)) is None:
+            return False
+        if (state := read_snapshot(key)) is None:
+            return False
+        try:
+            store_state, orphan_data_ids, irregular_ids = state
+            store = CardStore.restore(store_state)
+        except (ValueError, TypeError):
+            return False
+        store.versions = store.compute_versions(self.lazy_text)
+        if irregular_ids:
+            try:
+                with self.lock:
+                    versions = self._read_versions(self.get_conn(), irregular_ids)
+            except sqlite3.Error:
+                return False
+            for id in irregular_ids:
+                if id in store:
+                    store.set_version(id, versions.get(id, 0))
+        self.card_dict = store
+        self.sorted_id_lst[:] = sorted(store)
+        self.show_id_lst = self.sorted_id_lst
+        self.orphan_data_ids = orphan_data_ids
+        self.name_index = None
+        self.text_index = None
+        self.index_builds.clear()
+        self.alias_graph = None
+        if self.sorted_id_lst:
+            self.now_id = self.sorted_id_lst[0]
+            self.select_id_lst.clear()
             self.select_id_lst.add(self.now_id)
+        return True
+
+    def _dump_snapshot(self) -> tuple | None:
+        """記憶體與資料庫完全一致時回傳快照內容, 否則回傳 None"""
+        if self.loading or self.partial or self.load_error or self.conflicts:
+            return None
+        if self.is_dirty() or self.has_external_change():
+            return None
+        store = self.card_dict
+        # 重新計算的版本與載入時不同的列, 還原時需從資料庫讀取版本
+        irregular_ids = [
+            id
+            for id, old, new in zip(
+                store.data_col[0], store.versions, store.compute_versions(self.lazy_text)
+            )
+            if old != new
+        ]
+        # 之後補上 texts 的卡不再是 orphan, 仍缺少 texts 的卡一定在不規則列中
+        irregular_set = set(irregular_ids)
+        orphan_data_ids = [id for id in self.orphan_data_ids if id in irregular_set]
+        return (store.dump(self.lazy_text), orphan_data_ids, irregular_ids)
+
+    def get_load_report(self) -> str:
+        """回傳載入時發現的問題, 沒有問題時回傳空字串"""
+        msg_lst = []
+        if self.load_error:
+            msg_lst.append(f"读取失败: {self.load_error}")
+        if self.partial:
+            msg_lst.append(f"已取消载入, 只读取了 {len(self.card_dict)} 张卡片")
+        for title, id_lst in [
+            ("缺少 texts 的卡片", self.orphan_data_ids),
+            ("缺少 datas 的文本", self.orphan_text_ids),
+        ]:
+            if id_lst:
+                shown = ", ".join(str(id) for id in id_lst[:20])
+                more = f" ... 共 {len(id_lst)} 个" if len(id_lst) > 20 else ""
+                msg_lst.append(f"{title}: {shown}{more}")
+        return "\n".join(msg_lst)
+
+    def load_text(self, card: Card) -> Card:
+        """
+        確保 card 的 desc 與 strs 已載入, lazy_text 模式下按 id 從資料庫讀取
+        card 的 name 一直存在, 不會被資料庫的值覆蓋
+        最近讀取的卡片保留在 text_cache 中, 超過 text_cache_size 時釋放最舊的文本
+        """
+        store = self.card_dict
+        if not self.lazy_text or card.id not in store:
+            return card
+        if not store.is_text_loaded(card.id):
+            try:
+                with self.lock:
+                    conn = self.get_conn()
+                    text = conn.execute(sql_get_text, (card.id,)).fetchone()
+            except sqlite3.Error:
+                text = None
+            store.set_text(card.id, text or (card.id, store.get_name(card.id), ""))
+        if not card.text_loaded:
+            name = card.name
+            card.set_text(store.get_text_row(card.id))
+            card.name = name
+        self._touch_text(card.id)
+        return card
+
+    def _touch_text(self, id: int):
+        """將 id 移到 text_cache 最新的位置, 並釋放超出容量的舊文本"""
+        self.text_cache[id] = None
+        self.text_cache.move_to_end(id)
+        while len(self.text_cache) > self.text_cache_size:
+            old_id, _ = self.text_cache.popitem(last=False)
+            if old_id in self.dirty_id_set:
+                continue
+            if old_id in self.card_dict:
+                self.card_dict.drop_text(old_id)
+
+    # ---------------- 外部修改 ----------------
+    def _row_version(self, id: int) -> int:
+        """以記憶體中的資料計算 id 寫入後的 row_version"""
+        return row_version(self.card_dict.get_load_row(id, self.lazy_text))
+
+    def _get_file_id(self) -> tuple[int, ...] | None:
+        """
+        回傳檔案識別, 檔案被替換時改變
+        working_copy 模式下記憶體中的資料庫看不到其他程式的修改, 也比較修改時間與大小
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        if self.working_copy:
+            return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+        return (st.st_dev, st.st_ino)
+
+    def _mark_synced(self):
+        """
+        記錄目前的 data_version 與檔案識別, 作為之後比較的基準
+        working_copy 模式下只以檔案識別比較, 不需開啟連線
+        """
+        if not self.working_copy:
+            with self.lock:
+                conn = self.get_conn()
+                self.data_version = conn.execute(sql_data_version).fetchone()[0]
+        self.file_id = self._get_file_id()
+
+    def has_external_change(self) -> bool:
+        """
+        檢查其他連線或程式是否修改了資料庫
+        data_version 只在其他連線提交後改變, 檔案被整個替換時以檔案識別發現
+        """
+        if self.conn is None or self.loading:
+            return False
+        if self._get_file_id() != self.file_id:
+            return True
+        if self.working_copy:
+            return False
+        try:
+            with self.lock:
+                version = self.conn.execute(sql_data_version).fetchone()[0]
+        except sqlite3.Error:
+            return False
+        return version != self.data_version
+
+    def reload_external(self) -> tuple[list[int], list[int]]:
+        """
+        重新讀取資料庫並與記憶體中的 row_version 比較, 只載入內容改變或新增的卡,
+        並移除資料庫中已不存在的卡, 回傳 (改變或新增的 id, 移除的 id)
+        尚未寫入的修改與刪除以記憶體為準, 不會被覆蓋, 讀取失敗時丟出 sqlite3.Error
+        lazy_text 模式下已載入的文本會被釋放, 之後從資料庫重新讀取
+        GUI 以 begin_reload, scan_external, finish_reload 分開執行, 讀取比較在背景執行緒
+        working_copy 模式下重新載入整個檔案, 以新的 working copy 比較後換上
+        """
+        base = self.begin_reload()
+        try:
+            if self.working_copy:
+                conn, file_id = self.open_working_copy()
+                try:
+                    new_rows, seen = self.scan_external(conn, base)
+                except sqlite3.Error:
+                    conn.close()
+                    raise
+                self.set_working_copy(conn, file_id)
+            else:
+                with self.lock:
+                    new_rows, seen = self.scan_external(self.get_conn(), base)
+        except sqlite3.Error:
+            # 讀取失敗, 下次檢查時重試
+            self.data_version = -1
+            raise
+        return self.finish_reload(base, new_rows, seen)
+
+    def begin_reload(self) -> dict[int, int]:
+        """
+        重新載入的第一步, 在 GUI 執行緒執行
+        檔案被替換時重新開啟連線, 記錄目前的 data_version,
+        回傳各卡 row_version 的快照 id -> version 供 scan_external 比較, 失敗時丟出 sqlite3.Error
+        working_copy 模式下不改變連線, 由讀取的一方以 open_working_copy 與 set_working_copy 換上
+        """
+        store = self.card_dict
+        if self.working_copy:
+            return dict(zip(store.column("id"), store.versions))
+        if self._get_file_id() != self.file_id:
+            # 檔案被替換, 重新開啟連線
+            with self.lock:
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                self.schema_ok = False
+        try:
+            self._mark_synced()
+        except sqlite3.Error:
+            self.data_version = -1
+            raise
+        return dict(zip(store.column("id"), store.versions))
+
+    def scan_external(
+        self, conn: sqlite3.Connection, base: dict[int, int]
+    ) -> tuple[list[tuple], set[int]]:
+        """
+        以 conn 讀取所有卡並與快照 base 比較, 回傳 (內容改變或新增的列, 資料庫中所有的 id)
+        只讀取 conn 與 base, 不接觸記憶體中的卡片, 可在背景執行緒以自己的連線執行
+        """
+        new_rows = []
+        seen = set()
+        for rows in iter_card_rows(conn, lazy=self.lazy_text):
+            for row in rows:
+                id = row[0]
+                seen.add(id)
+                if base.get(id) != row_version(row):
+                    new_rows.append(row)
+        return new_rows, seen
+
+    def finish_reload(
+        self, base: dict[int, int], new_rows: list[tuple], seen: set[int]
+    ) -> tuple[list[int], list[int]]:
+        """
+        重新載入的最後一步, 在 GUI 執行緒套用 scan_external 的結果, 回傳 (改變或新增的 id, 移除的 id)
+        尚未寫入的修改與刪除, 以及快照之後才寫入或新增的卡以記憶體為準, 不會被覆蓋或移除
+        """
+        store = self.card_dict
+        keep = self.dirty_id_set | self.deleted_id_set | self.conflicts.keys()
+
+        # 與快照相同, 表示讀取期間記憶體中沒有改變
+        def unchanged(id: int) -> bool:
+            if id not in base:
+                return id not in store
+            return id in store and store.get_version(id) == base[id]
+
+        new_rows = [row for row in new_rows if row[0] not in keep and unchanged(row[0])]
+        removed_ids = [
+            id
+            for id in base
+            if id not in seen and id not in keep and unchanged(id)
+        ]
+        if self.lazy_text:
+            for id in list(self.text_cache):
+                if id not in self.dirty_id_set:
+                    del self.text_cache[id]
+                    if id in store:
+                        store.drop_text(id)
+            self.text_index = None
+        return self._apply_rows(new_rows, removed_ids), removed_ids
+
+    def _read_rows(self, conn: sqlite3.Connection, id_lst: list[int]) -> list[tuple]:
+        """以 iter_card_rows 的格式讀取 id_lst 中 datas 存在的列"""
+        sql = sql_load_names_in if self.lazy_text else sql_load_cards_in
+        rows = []
+        for i in range(0, len(id_lst), QUERY_CHUNK):
+            chunk = id_lst[i : i + QUERY_CHUNK]
+            rows += conn.execute(sql.format(",".join("?" * len(chunk))), chunk)
+        return rows
+
+    def _read_versions(self, conn: sqlite3.Connection, id_lst: list[int]) -> dict[int, int]:
+        """回傳 id_lst 中 datas 存在的 id 在資料庫中的 row_version"""
+        return {row[0]: row_version(row) for row in self._read_rows(conn, id_lst)}
+
+    def _apply_rows(self, new_rows: list[tuple], removed_ids: list[int]) -> list[int]:
+        """
+        以資料庫讀出的 new_rows 取代或新增記憶體中的卡, 並移除 removed_ids
+        更新排序列表, 顯示與文本索引, 回傳 new_rows 的 id
+        """
+        store = self.card_dict
+        changed_ids = [row[0] for row in new_rows]
+        added_ids = [id for id in changed_ids if id not in store]
+        for id in changed_ids:
+            if id in store:
+                del store[id]
+        for id in removed_ids:
+            del store[id]
+        store.append_rows(new_rows, self.lazy_text)
+        self._index_remove_many(removed_ids)
+        self._index_add_many(added_ids)
+        self._touch_index_builds(changed_ids)
+        if self.name_index is not None:
+            for id in changed_ids:
+                self.name_index.add(id, store.get_name(id))
+        if self.text_index is not None:
+            if self.lazy_text:
+                self.text_index = None
+            else:
+                for id in changed_ids:
+                    self.text_index.add(id, store.get_search_text(id))
+        if self.alias_graph is not None:
+            for id in changed_ids:
+                self.alias_graph.add(id, store.get_alias(id))
+        self.select_id_lst.difference_update(removed_ids)
+        if self.now_id not in store:
+            self.set_filter(self.show_id_lst)
+        return changed_ids
 
     # ---------------- 設定數據 ----------------
     def add_card(self, c: Card):
         """增加一張卡"""
+        old = self._journal_old(c)
+        if c.id not in self.card_dict:
+            self._index_add_many([c.id])
         self.card_dict[c.id] = c
-        self.save()
+        self.journal.record(c.id, old, c)
+        self.mark_dirty(c.id)
+        self._index_text([c])
+        self._changed()
+        if self.lazy_text:
+            self._touch_text(c.id)
 
-        self.show_id_lst = sorted(self.card_dict.keys(), key=lambda k: int(k))
+        self.show_id_lst = self.sorted_id_lst
 
         self.now_id = c.id
         self.select_id_lst.clear()
         self.select_id_lst.add(self.now_id)
 
+    def add_cards(self, cards: Iterable[Card], label: str = "") -> int:
+        """
+        批量增加卡片, 全部寫入在同一次 save 中完成, 列表只重新排序一次
+        cards 可以是產生器, 逐張寫入 card_dict, 不保留 Card 物件
+        所有修改在 journal 中合併為一筆 label 紀錄
+        now_id 指向最後一張加入的卡, 回傳加入的數量
+        """
+        id_lst = []
+        new_id_lst = []
+        try:
+            with self.journal.group(label):
+                for c in cards:
+                    old = self._journal_old(c)
+                    if c.id not in self.card_dict:
+                        new_id_lst.append(c.id)
+                    self.card_dict[c.id] = c
+                    self.journal.record(c.id, old, c)
+                    self.mark_dirty(c.id)
+                    self._index_text([c])
+                    id_lst.append(c.id)
+        finally:
+            # cards 中途丟出例外時, 已加入的卡仍需併入排序列表並寫回
+            if id_lst:
+                self._index_add_many(new_id_lst)
+                self._changed()
+        if not id_lst:
+            return 0
+        if self.lazy_text:
+            for id in id_lst:
+                self._touch_text(id)
+
+        self.show_id_lst = self.sorted_id_lst
+
+        self.now_id = id_lst[-1]
+        self.select_id_lst.clear()
+        self.select_id_lst.add(self.now_id)
+        return len(id_lst)
+
     def del_card(self, id: int):
         """刪除 id 的卡"""
         if id in self.card_dict:
+            self.journal.record(id, self._journal_old(self.card_dict[id]), None)
+            self.mark_deleted(id)
             del self.card_dict[id]
+            self._index_remove_many([id])
+            self._changed()
+
+    def _journal_old(self, c: Card) -> Card | None:
+        """
+        寫入 c 之前取出同 id 的舊卡供 journal 比較, 沒有舊卡或暫停記錄時回傳 None
+        lazy_text 模式下兩者的文本都會先載入, c 未載入文本時補上 desc 與 strs,
+        保留呼叫端修改的 name, 寫入後文本完整, 才會連同 texts 寫回
+        """
+        if not c.text_loaded:
+            self.load_text(c)
+        if self.journal.paused or c.id not in self.card_dict:
+            return None
+        return self.load_text(self.card_dict[c.id])
+
+    # ---------------- 復原 ----------------
+    def undo(self) -> list[int]:
+        """復原 journal 中最新的一筆修改, 經由一般的保存流程寫回, 回傳受影響的 id"""
+        if (entry := self.journal.take_undo()) is None:
+            return []
+        return self._apply_fields([(d.id, d.before) for d in reversed(entry.deltas)])
+
+    def redo(self) -> list[int]:
+        """重做最近一筆被復原的修改, 回傳受影響的 id"""
+        if (entry := self.journal.take_redo()) is None:
+            return []
+        return self._apply_fields([(d.id, d.after) for d in entry.deltas])
+
+    def _apply_fields(self, id_fields: list[tuple[int, dict | None]]) -> list[int]:
+        """
+        依序將各 id 的欄位套用到卡片上, 欄位為 None 時刪除該卡, 不存在的卡以欄位新建
+        只改動列出的欄位, 排序列表與文本索引在最後一次更新, now_id 指向最後一張卡
+        """
+        store = self.card_dict
+        id_lst = list(dict.fromkeys(id for id, _ in id_fields))
+        existed = {id for id in id_lst if id in store}
+        self.journal.paused = True
+        try:
+            for id, fields in id_fields:
+                if fields is None:
+                    if id in store:
+                        self.mark_deleted(id)
+                        del store[id]
+                    continue
+                c = self.load_text(store[id]) if id in store else Card(id)
+                for key, value in fields.items():
+                    setattr(c, key, list(value) if key == "strs" else value)
+                store[id] = c
+                self.mark_dirty(id)
+        finally:
+            self.journal.paused = False
+        self._index_remove_many([id for id in existed if id not in store])
+        self._index_add_many([id for id in id_lst if id in store and id not in existed])
+        kept_lst = [id for id in id_lst if id in store]
+        self._index_text([store[id] for id in kept_lst])
+        self._changed()
+        if self.lazy_text:
+            for id in kept_lst:
+                self._touch_text(id)
+
+        self.show_id_lst = self.sorted_id_lst
+        if kept_lst:
+            self.now_id = kept_lst[-1]
+        elif self.now_id not in store:
+            self.now_id = self.get_first_id()
+        self.select_id_lst.clear()
+        self.select_id_lst.add(self.now_id)
+        return id_lst
+
+    def _index_add_many(self, id_lst: list[int]):
+        """將新的 id 併入 sorted_id_lst, 少量時逐個插入, 大量時一次合併"""
+        self._show_pos = None
+        if len(id_lst) <= 32:
+            for id in id_lst:
+                insort(self.sorted_id_lst, id)
+        else:
+            merged = list(heapq.merge(self.sorted_id_lst, sorted(id_lst)))
+            self.sorted_id_lst[:] = merged
+
+    def _index_remove_many(self, id_lst: list[int]):
+        """從 sorted_id_lst, 篩選中的 show_id_lst, 文本與同名卡索引移除 id"""
+        self._show_pos = None
+        self._touch_index_builds(id_lst)
+        for index in (self.name_index, self.text_index, self.alias_graph):
+            if index is not None:
+                for id in id_lst:
+                    index.discard(id)
+        if len(id_lst) <= 32:
+            for id in id_lst:
+                i = bisect_left(self.sorted_id_lst, id)
+                if i < len(self.sorted_id_lst) and self.sorted_id_lst[i] == id:
+                    del self.sorted_id_lst[i]
+        else:
+            del_set = set(id_lst)
+            kept = [id for id in self.sorted_id_lst if id not in del_set]
+            self.sorted_id_lst[:] = kept
+        if self.show_id_lst is not self.sorted_id_lst:
+            del_set = set(id_lst)
+            self.show_id_lst = [id for id in self.show_id_lst if id not in del_set]
+
+    def _index_text(self, card_lst: list[Card]):
+        """更新已建立的文本與同名卡索引"""
+        self._touch_index_builds(c.id for c in card_lst)
+        if self.name_index is not None:
+            for c in card_lst:
+                self.name_index.add(c.id, c.name or "")
+        if self.text_index is not None:
+            for c in card_lst:
+                self.text_index.add(c.id, c.get_search_text())
+        if self.alias_graph is not None:
+            for c in card_lst:
+                self.alias_graph.add(c.id, c.alias)
+
+    def mark_dirty(self, id: int):
+        """標記 id 的卡需要寫回資料庫"""
+        if (version := self.deleted_versions.pop(id, None)) is not None:
+            # 刪除後又加回, 資料庫中仍是刪除前的版本
+            if id in self.card_dict:
+                self.card_dict.set_version(id, version)
+        self.deleted_id_set.discard(id)
+        self.dirty_id_set.add(id)
+
+    def mark_deleted(self, id: int):
+        """標記 id 的卡需要從資料庫刪除, 需在從 card_dict 刪除前呼叫以保留版本"""
+        if id in self.card_dict and id not in self.deleted_versions:
+            self.deleted_versions[id] = self.card_dict.get_version(id)
+        self.dirty_id_set.discard(id)
+        self.deleted_id_set.add(id)
+
+    def is_dirty(self) -> bool:
+        """檢查是否有尚未寫回的修改"""
+        return bool(self.dirty_id_set or self.deleted_id_set)
+
+    def _changed(self):
+        """
+        卡片修改後呼叫, 沒有 change_listener 時立即 save
+        有 change_listener 時 (例如 GUI 的背景寫入) 交由其安排寫入時機
+        """
+        if self.change_listener is None:
             self.save()
+        else:
+            self.change_listener()
 
-    def save(self):
-        """將 cdb 保存到 path"""
-        try:
-            with sqlite3.connect(self.path) as conn:
-                cur = conn.cursor()
-                cur.execute(sql_set_datas)
-                cur.execute(sql_set_texts)
-                cur.execute("DELETE FROM datas")
-                cur.execute("DELETE FROM texts")
-                sorted_cards = sorted(self.card_dict.values(), key=lambda card: card.id)
-                for card in sorted_cards:
-                    data_row = (
-                        card.id,
-                        card.ot,
-                        card.alias,
-                        card.setcode,
-                        card.type,
-                        card.atk,
-                        card.def_,
-                        card.level,
-                        card.race,
-                        card.attribute,
-                        card.category,
-                    )
-                    cur.execute(sql_insert_datas, data_row)
-                    hints = card.strs
-                    if len(hints) < 16:
-                        hints += [""] * (16 - len(hints))
-                    else:
-                        hints = hints[:16]
-                    text_row = (int(card.id), card.name or "", card.desc or "", *hints)
-                    cur.execute(sql_insert_texts, text_row)
+    def take_changes(self) -> ChangeSet:
+        """
+        取出 dirty_id_set 與 deleted_id_set 對應的列並清空標記
+        各卡的版本先更新為寫入後的版本, 之後取出的修改以此為基準
+        """
+        store = self.card_dict
+        dirty_lst = sorted(self.dirty_id_set)
+        del_lst = sorted(self.deleted_id_set)
+        data_rows = [store.get_data_row(id) for id in dirty_lst]
+        # 未載入文本的卡只有 datas 被修改
+        text_rows = [
+            store.get_text_row(id) for id in dirty_lst if store.is_text_loaded(id)
+        ]
+        bases = {id: store.get_version(id) for id in dirty_lst}
+        bases.update((id, self.deleted_versions.pop(id, 0)) for id in del_lst)
+        versions = {id: self._row_version(id) for id in dirty_lst}
+        versions.update((id, 0) for id in del_lst)
+        for id in dirty_lst:
+            store.set_version(id, versions[id])
+        changes = ChangeSet(data_rows, text_rows, del_lst, bases, versions)
+        self.dirty_id_set.clear()
+        self.deleted_id_set.clear()
+        return changes
 
-                conn.commit()
-        except Exception:
-            pass
+    def write_changes(self, changes: ChangeSet):
+        """
+        在同一個 BEGIN IMMEDIATE 交易中寫入 changes, 可在背景執行緒呼叫
+        先在交易中比對各列目前的版本, 被其他程式改過的列不寫入並記錄在 changes.conflicts
+        working_copy 模式下提交後再整個寫回檔案, 失敗時丟出 sqlite3.Error
+        """
+        with self.lock:
+            conn = self.get_conn()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self._ensure_schema(conn)
+                self._check_conflicts(conn, changes)
+                skip = changes.conflicts
+                del_rows = [(id,) for id in changes.del_ids if id not in skip]
+                conn.executemany(sql_delete_datas, del_rows)
+                conn.executemany(sql_delete_texts, del_rows)
+                conn.executemany(
+                    sql_replace_datas, (r for r in changes.data_rows if r[0] not in skip)
+                )
+                conn.executemany(
+                    sql_replace_texts, (r for r in changes.text_rows if r[0] not in skip)
+                )
+            self._flush_file()
+
+    def _check_conflicts(self, conn: sqlite3.Connection, changes: ChangeSet):
+        """資料庫中的版本不是 bases 也不是 versions 時記錄為衝突"""
+        current = self._read_versions(conn, list(changes.bases))
+        for id, base in changes.bases.items():
+            version = current.get(id, 0)
+            if version != base and version != changes.versions.get(id, 0):
+                changes.conflicts[id] = version
+
+    def finish_changes(self, changes: ChangeSet):
+        """
+        寫入完成後在 GUI 執行緒呼叫, 失敗時重新標記修改, 衝突的 id 加入 conflicts
+        等待 resolve_conflicts 決定保留哪一方
+        """
+        if changes.error:
+            self.restore_changes(changes)
+            return
+        self.conflicts.update(changes.conflicts)
+
+    def restore_changes(self, changes: ChangeSet):
+        """寫入失敗後重新標記 changes 中的 id, 之後又被修改過的 id 以新的標記為準"""
+        store = self.card_dict
+        for row in changes.data_rows:
+            id = row[0]
+            if id in store and id not in self.deleted_id_set:
+                if store.get_version(id) == changes.versions[id]:
+                    store.set_version(id, changes.bases[id])
+                self.dirty_id_set.add(id)
+        for id in changes.del_ids:
+            if id not in store and id not in self.dirty_id_set:
+                self.deleted_versions.setdefault(id, changes.bases[id])
+                self.deleted_id_set.add(id)
+
+    def resolve_conflicts(self, keep_mine: bool) -> list[int]:
+        """
+        處理 conflicts 中的 id, keep_mine 為 True 時以記憶體的內容覆蓋資料庫,
+        否則從資料庫重新載入這些卡並放棄本地的修改, 回傳處理的 id
+        """
+        conflicts = self.conflicts
+        self.conflicts = {}
+        if not conflicts:
+            return []
+        store = self.card_dict
+        id_lst = sorted(conflicts)
+        if keep_mine:
+            for id, version in conflicts.items():
+                if id in store:
+                    store.set_version(id, version)
+                    self.mark_dirty(id)
+                else:
+                    self.deleted_versions[id] = version
+                    self.mark_deleted(id)
+            self._changed()
+            return id_lst
+        for id in id_lst:
+            self.dirty_id_set.discard(id)
+            self.deleted_id_set.discard(id)
+            self.deleted_versions.pop(id, None)
+        with self.lock:
+            rows = self._read_rows(self.get_conn(), id_lst)
+        found = {row[0] for row in rows}
+        removed_ids = [id for id in id_lst if id not in found and id in store]
+        self._apply_rows(rows, removed_ids)
+        return id_lst
+
+    def save(self) -> bool:
+        """
+        將修改過的卡片寫回 path, 只處理 dirty_id_set 與 deleted_id_set 中的 id
+        全部寫入在同一個交易中完成, 失敗時保留標記以便下次重試
+        與其他程式的修改衝突的卡不會寫入, 記錄在 conflicts, 此時回傳 False
+        """
+        if not self.is_dirty():
+            return True
+        changes = self.take_changes()
+        try:
+            self.write_changes(changes)
+        except sqlite3.Error as e:
+            changes.error = str(e)
+        self.finish_changes(changes)
+        return not (changes.error or changes.conflicts)
+
+    def compact(self) -> bool:
+        """
+        清空 datas 與 texts 後按 id 順序重寫所有卡片, 並 VACUUM 整理檔案
+        重寫前先刪除編輯器管理的索引, 寫入後再一次建立, 原有的索引與 index_columns 都會保留
+        載入中或取消載入的 cdb 只有部分卡片, 有尚未載入的外部修改時會覆蓋其內容, 都不會整理
+        """
+        if self.loading or self.partial or self.has_external_change():
+            return False
+        store = self.card_dict
+        try:
+            with self.lock:
+                conn = self.get_conn()
+                with conn:
+                    cur = conn.cursor()
+                    self._ensure_schema(conn)
+                    # lazy_text 模式下未載入的文本先從舊表取出
+                    stored = {}
+                    if self.lazy_text:
+                        for row in cur.execute("SELECT * FROM texts"):
+                            if row[0] in store and not store.is_text_loaded(row[0]):
+                                stored[row[0]] = row
+                    index_lst = check_index_columns(get_indexes(conn) + self.index_columns)
+                    drop_indexes(conn, index_lst)
+                    cur.execute("DELETE FROM datas")
+                    cur.execute("DELETE FROM texts")
+                    cur.executemany(
+                        sql_insert_datas,
+                        (store.get_data_row(id) for id in self.sorted_id_lst),
+                    )
+                    cur.executemany(
+                        sql_insert_texts,
+                        (
+                            stored.get(id) or store.get_text_row(id)
+                            for id in self.sorted_id_lst
+                        ),
+                    )
+                    create_indexes(conn, index_lst)
+                conn.execute("VACUUM")
+                self._flush_file()
+        except sqlite3.Error:
+            return False
+        self.dirty_id_set.clear()
+        self.deleted_id_set.clear()
+        self.deleted_versions.clear()
+        self.conflicts.clear()
+        for id in self.sorted_id_lst:
+            store.set_version(id, self._row_version(id))
+        return True
 
     # ---------------- 獲取數據 ----------------
     def get_first_id(self) -> int:
         """獲取第一張卡的 id"""
-        if not self.card_dict:
+        if not self.sorted_id_lst:
             return 0
-        return next(iter(self.card_dict))
+        return self.sorted_id_lst[0]
+
+    def get_id_lst(self) -> list[int]:
+        """回傳按 id 排序的所有卡片 id, 此列表由 CDB 維護, 呼叫端不可修改"""
+        return self.sorted_id_lst
 
     def get_card(self, id: int | str | None) -> Card | None:
         """回傳指定 id 的 Card, 找不到對應 id 回傳 None"""
@@ -176,45 +1612,258 @@ class CDB:
             return True
         return False
 
+    def get_id_range(self, id_st: int, id_ed: int) -> list[int]:
+        """以二分搜尋回傳 id_st <= id <= id_ed 的已排序 id"""
+        ind_st = bisect_left(self.sorted_id_lst, id_st)
+        ind_ed = bisect_right(self.sorted_id_lst, id_ed)
+        return self.sorted_id_lst[ind_st:ind_ed]
+
+    def get_id_prefix(self, id_prefix: str) -> list[int]:
+        """
+        回傳以 id_prefix 開頭的已排序 id
+        前綴 p 對應各位數的區間 [p * 10^k, (p + 1) * 10^k - 1], 各區間依序不重疊
+        """
+        if not self.sorted_id_lst:
+            return []
+        if id_prefix.startswith("0"):
+            return [0] if id_prefix == "0" and self.has_id(0) else []
+        prefix = int(id_prefix)
+        max_id = self.sorted_id_lst[-1]
+        res_lst = []
+        scale = 1
+        while prefix * scale <= max_id:
+            res_lst += self.get_id_range(prefix * scale, (prefix + 1) * scale - 1)
+            scale *= 10
+        return res_lst
+
     def search_id(self, id_prefix: str):
         """
         根據 id 篩選卡片, 如果為空則顯示所有卡片, 同時清空已選中的卡
+        id_prefix 可以是 id 開頭的數字, 或是 "起始-結束" 的 id 區間, 起訖顛倒時交換
+        格式不符時沒有符合的卡片
         不會回傳值, 只會更新內部的 now_id, show_id_lst 和 select_id_lst
         """
-        if id_prefix:
-            match_id_lst = [
-                id for id in self.card_dict.keys() if str(id).startswith(id_prefix)
-            ]
-            self.show_id_lst = match_id_lst
+        id_prefix = id_prefix.replace(" ", "")
+        if not id_prefix:
+            self.set_filter(self.sorted_id_lst)
+        elif (id_range := parse_id_range(id_prefix)) is not None:
+            self.set_filter(self.get_id_range(*id_range))
+        elif is_id_text(id_prefix):
+            self.set_filter(self.get_id_prefix(id_prefix))
         else:
-            self.show_id_lst = sorted(self.card_dict.keys(), key=lambda k: int(k))
+            self.set_filter([])
 
-        if self.now_id in self.show_id_lst:
-            pass
-        elif self.show_id_lst:
-            self.now_id = self.show_id_lst[0]
-        else:
-            self.now_id = 0
-        self.select_id_lst.clear()
-        self.select_id_lst.add(self.now_id)
+    def get_column(self, key: str) -> array:
+        """回傳 datas 欄位 key 的數值陣列, 各欄順序與 get_column("id") 相同"""
+        return self.card_dict.column(key)
 
-    def search_name(self, name: str):
+    def search_filter(self, cond_lst: list[Cond]):
         """
-        根據 name 篩選卡片, 如果為空則顯示所有卡片, 同時清空已選中的卡
+        根據 CardFilter 的條件篩選卡片, 如果為空則顯示所有卡片, 同時清空已選中的卡
         不會回傳值, 只會更新內部的 now_id, show_id_lst 和 select_id_lst
         """
-        if name:
-            name_lower = name.lower()  # 進行不區分大小寫的匹配
-            match_id_lst = [
-                key
-                for key, card in self.card_dict.items()
-                if card.name and name_lower in card.name.lower()
-            ]
-            self.show_id_lst = match_id_lst
+        self.set_filter(eval_filter(self, cond_lst) if cond_lst else self.sorted_id_lst)
+
+    def iter_search_text(self, id_lst: Iterable[int] | None = None):
+        """
+        產出 (id, 全文) 供全文索引使用, id_lst 為 None 時產出所有卡片
+        lazy_text 模式下未載入的文本直接從資料庫串流讀取
+        """
+        if not self.lazy_text:
+            if id_lst is None:
+                id_lst = self.sorted_id_lst
+            for id in id_lst:
+                yield id, self.card_dict.get_search_text(id)
+            return
+        if id_lst is None:
+            sql_lst = [("SELECT * FROM texts", ())]
+        else:
+            id_lst = list(id_lst)
+            sql_lst = []
+            for i in range(0, len(id_lst), QUERY_CHUNK):
+                chunk = id_lst[i : i + QUERY_CHUNK]
+                mark = ",".join("?" * len(chunk))
+                sql_lst.append((f"SELECT * FROM texts WHERE id IN ({mark})", chunk))
+        store = self.card_dict
+        conn = self.get_conn()
+        for sql, args in sql_lst:
+            with self.lock:
+                cursor = conn.execute(sql, args)
+            while True:
+                with self.lock:
+                    rows = cursor.fetchmany(LOAD_ARRAYSIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    if row[0] not in store:
+                        continue
+                    if store.is_text_loaded(row[0]):
+                        yield row[0], store.get_search_text(row[0])
+                    else:
+                        yield row[0], "\n".join(t or "" for t in row[1:])
+
+    # ---------------- 文本索引 ----------------
+    def index_docs(self, kind: str) -> Iterator[tuple[int, str]]:
+        """
+        依 id 順序產出建立 kind ("name" 或 "text") 索引的 (id, 文本)
+        呼叫時複製所需的欄位, 之後只讀取副本, 可交給背景執行緒產出
+        lazy_text 模式下未載入的全文在產出時以獨立的連線從資料庫讀取
+        """
+        store = self.card_dict
+        ids = array("q", store.column("id"))
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        names = list(store.names)
+        if kind == "name":
+            return ((ids[row], names[row]) for row in order)
+        descs = list(store.descs)
+        hints = dict(store.hints)
+
+        def join_text(row: int) -> str:
+            return "\n".join([names[row], descs[row] or "", *hints.get(ids[row], ())])
+
+        if not self.lazy_text:
+            return ((ids[row], join_text(row)) for row in order)
+        # 已載入的文本可能有尚未寫入的修改, 以記憶體為準
+        loaded = {ids[row]: join_text(row) for row in order if descs[row] is not None}
+        id_set = set(ids)
+        path = self.path
+
+        def read_lazy() -> Iterator[tuple[int, str]]:
+            conn = sqlite3.connect(path)
+            try:
+                for row in conn.execute("SELECT * FROM texts ORDER BY id"):
+                    id = row[0]
+                    if id in loaded:
+                        yield id, loaded.pop(id)
+                    elif id in id_set:
+                        yield id, "\n".join(t or "" for t in row[1:])
+            finally:
+                conn.close()
+            # 沒有 texts 的卡只有記憶體中的文本
+            yield from sorted(loaded.items())
+
+        return read_lazy()
+
+    def begin_index_build(self, kind: str) -> tuple[Iterator[tuple[int, str]], set[int]]:
+        """
+        開始在背景建立 kind 的索引, 回傳 (index_docs 的產出, 建立期間改變的 id)
+        建立中的索引在重新載入卡片後作廢, 完成後以 finish_index_build 交回
+        """
+        touched: set[int] = set()
+        self.index_builds[kind] = touched
+        return self.index_docs(kind), touched
+
+    def finish_index_build(self, kind: str, index: TextIndex, touched: set[int]) -> bool:
+        """
+        在 GUI 執行緒換上背景建立的索引, 並補上建立期間改變的卡, 回傳是否採用
+        已作廢或之後又開始建立時不採用
+        """
+        if self.index_builds.get(kind) is not touched:
+            return False
+        del self.index_builds[kind]
+        store = self.card_dict
+        for id in touched:
+            if id not in store:
+                index.discard(id)
+        changed = sorted(id for id in touched if id in store)
+        if kind == "name":
+            for id in changed:
+                index.add(id, store.get_name(id))
+            self.name_index = index
+        else:
+            for id, text in self.iter_search_text(changed):
+                index.add(id, text)
+            self.text_index = index
+        return True
+
+    def _touch_index_builds(self, ids: Iterable[int]):
+        """記錄建立中的索引需要補上的 id"""
+        if self.index_builds:
+            ids = list(ids)
+            for touched in self.index_builds.values():
+                touched.update(ids)
+
+    def _get_index(self, kind: str) -> TextIndex | None:
+        """
+        取得 kind 的索引, 第一次使用或殘留過多時重建
+        設定 index_listener 時交給它在背景建立, 完成前回傳 None 或殘留過多但仍正確的舊索引
+        """
+        index = self.name_index if kind == "name" else self.text_index
+        if index is not None and not index.need_rebuild():
+            return index
+        if self.index_listener is not None:
+            self.index_listener(kind)
+            return index
+        index = TextIndex()
+        index.build(self.index_docs(kind))
+        if kind == "name":
+            self.name_index = index
         else:
-            self.show_id_lst = sorted(self.card_dict.keys(), key=lambda k: int(k))
+            self.text_index = index
+        return index
+
+    def _find(
+        self, kind: str, query: str, match: Callable[[list[int], str], list[int]]
+    ) -> list[int]:
+        """以索引搜尋, 索引建立中時直接比對所有卡"""
+        if (index := self._get_index(kind)) is not None:
+            return index.search(query, match)
+        if not query:
+            return []
+        return sorted(match(list(self.card_dict), query.lower()))
+
+    def find_name(self, name: str) -> list[int]:
+        """回傳 name 包含 name 的已排序 id (不區分大小寫)"""
+
+        def match(cand: list[int], query: str) -> list[int]:
+            get_name = self.card_dict.get_name
+            return [id for id in cand if query in get_name(id).lower()]
+
+        return self._find("name", name, match)
+
+    def find_text(self, text: str) -> list[int]:
+        """回傳 name, desc 或 strs 包含 text 的已排序 id (不區分大小寫)"""
+
+        def match(cand: list[int], query: str) -> list[int]:
+            return [id for id, t in self.iter_search_text(cand) if query in t.lower()]
+
+        return self._find("text", text, match)
+
+    # ---------------- 同名卡 ----------------
+    def _get_alias_graph(self) -> AliasGraph:
+        """第一次使用時建立同名卡索引, 之後隨修改更新"""
+        if self.alias_graph is None:
+            store = self.card_dict
+            self.alias_graph = AliasGraph()
+            self.alias_graph.build(zip(store.column("id"), store.column("alias")))
+        return self.alias_graph
+
+    def aliases_of(self, id: int) -> list[int]:
+        """回傳以 id 為同名卡的已排序 id"""
+        return sorted(self._get_alias_graph().aliases_of(id))
 
-        if self.now_id in self.show_id_lst:
+    def resolve_alias(self, id: int) -> tuple[list[int], bool]:
+        """
+        從 id 沿著同名卡走到最終的卡, 回傳經過的 id 與是否形成循環
+        最後一個 id 不存在時表示指向不存在的卡
+        """
+        return self._get_alias_graph().resolve(id)
+
+    def find_alias_cycles(self) -> list[list[int]]:
+        """回傳所有同名卡循環"""
+        return self._get_alias_graph().find_cycles()
+
+    def find_dangling_aliases(self) -> list[int]:
+        """回傳同名卡不存在的 id"""
+        return self._get_alias_graph().find_dangling(self.card_dict)
+
+    def set_filter(self, id_lst: list[int]):
+        """
+        以 id_lst 作為 show_id_lst, 同時清空已選中的卡
+        now_id 不在 id_lst 中時改為第一張
+        """
+        self.show_id_lst = id_lst
+        if self.get_show_index(self.now_id) != -1:
             pass
         elif self.show_id_lst:
             self.now_id = self.show_id_lst[0]
@@ -223,19 +1872,39 @@ class CDB:
         self.select_id_lst.clear()
         self.select_id_lst.add(self.now_id)
 
+    def search_name(self, name: str):
+        """
+        根據 name 篩選卡片 (不區分大小寫), 如果為空則顯示所有卡片, 同時清空已選中的卡
+        不會回傳值, 只會更新內部的 now_id, show_id_lst 和 select_id_lst
+        """
+        self.set_filter(self.find_name(name) if name else self.sorted_id_lst)
+
+    def search_text(self, text: str):
+        """
+        根據 name, desc 與 strs 全文篩選卡片, 如果為空則顯示所有卡片, 同時清空已選中的卡
+        不會回傳值, 只會更新內部的 now_id, show_id_lst 和 select_id_lst
+        """
+        try:
+            id_lst = self.find_text(text) if text else self.sorted_id_lst
+        except sqlite3.Error:
+            id_lst = []
+        self.set_filter(id_lst)
+
     def del_select_card(self):
         """刪除 self.select_id_lst 中選中的所有卡片, 然後更新 now_id, show_id_lst 和 select_id_lst"""
         if not self.select_id_lst:
             return
 
-        del_id_lst = self.select_id_lst.copy()
-        for id in del_id_lst:
-            if id in self.card_dict:
+        del_id_lst = [id for id in self.select_id_lst if id in self.card_dict]
+        with self.journal.group("删除"):
+            for id in del_id_lst:
+                self.journal.record(id, self._journal_old(self.card_dict[id]), None)
+                self.mark_deleted(id)
                 del self.card_dict[id]
+        self._index_remove_many(del_id_lst)
 
-        self.save()
+        self._changed()
 
-        self.show_id_lst = [id for id in self.show_id_lst if id not in del_id_lst]
         self.select_id_lst.clear()
 
         if self.show_id_lst:
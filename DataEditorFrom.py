@@ -1,4 +1,10 @@
+import CardIO
+from CardValidator import CardRules, format_report, validate_cdb, validate_file
 from DataBase import CDB, Card
+from SqlCDB import SqlCDB
+from CardFilter import parse_filter
+from CdbDiff import CardDiff, MERGE_POLICIES, diff_cdb, plan_merge, merge_into
+from ConfigLoader import CardInfo, load_cardinfo
 from ItemLib import (
     new_frame,
     new_panel,
@@ -7,11 +13,12 @@ from ItemLib import (
     CardDataSet,
     CardTextSet,
 )
-from PyQt6.QtWidgets import QWidget, QHBoxLayout
+from PyQt6.QtWidgets import QWidget, QHBoxLayout, QInputDialog, QFileDialog
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QKeySequence, QShortcut
 from Global import get_main
 import os
+import sqlite3
 import subprocess
 import platform
 
@@ -21,12 +28,16 @@ class DataEditor(QWidget):
     card_data: CardDataSet
     card_text: CardTextSet
     copy_card: dict[int, Card]
+    cardinfo: CardInfo
+    filter_expr: str
 
     def __init__(self):
         super().__init__()
         # 卡片列表
         self.card_list = CardListSet()
         self.copy_card = {}
+        self.cardinfo = load_cardinfo()
+        self.filter_expr = ""
         # ---------------- 中央容器 ----------------
         mid_panel, mid_frame = new_panel("V")
         # 卡片文本編輯區
@@ -35,6 +46,8 @@ class DataEditor(QWidget):
         btn_frame: QHBoxLayout = new_frame("H", mid_frame)
         btn_frame.addStretch()
         new_btn("重置列表", btn_frame, self.card_list.clear_filter)
+        new_btn("全文搜索", btn_frame, self.card_text.search_text)
+        new_btn("条件筛选", btn_frame, self.filter_card)
         new_btn("脚本", btn_frame, self.open_script)
         new_btn("重置资料", btn_frame, self.clear)
         btn_frame.addStretch()
@@ -57,6 +70,9 @@ class DataEditor(QWidget):
         )
         shortcut = QShortcut(QKeySequence("Ctrl+S"), self)
         shortcut.activated.connect(savcard_btn.click)  # 按下時模擬按鈕點擊
+        # 輸入框有焦點時由輸入框處理自己的撤銷
+        QShortcut(QKeySequence("Ctrl+Z"), self).activated.connect(self.undo)
+        QShortcut(QKeySequence("Ctrl+Y"), self).activated.connect(self.redo)
         btn_frame.addStretch()
         # ---------------- 設置中央 Widget ----------------
         main_frame: QHBoxLayout = new_frame("H", self, None, False)
@@ -66,11 +82,21 @@ class DataEditor(QWidget):
         self.setVisible(False)  # 初始隱藏
 
     # 設定 cdb
-    def set_cdb(self, cdb: CDB | None = None):
+    def set_cdb(self, cdb: CDB | SqlCDB | None = None):
         self.card_list.set_data_source(cdb)
         self.card_list.refresh_view()
         self.updata()
 
+    # 唯讀瀏覽的 cdb 與載入中只有部分卡片的 cdb 不能修改
+    def is_locked(self, cdb: CDB | SqlCDB) -> bool:
+        if cdb.read_only:
+            get_main().show_error("数据库以只读浏览方式打开, 不能修改")
+            return True
+        if cdb.loading:
+            get_main().show_error("数据库载入中, 请等待载入完成或取消载入")
+            return True
+        return False
+
     # 更新
     def updata(self):
         if (card := self.card_list.get_now_card()) is None:
@@ -83,11 +109,33 @@ class DataEditor(QWidget):
         self.card_data.clear()
         self.card_text.clear()
 
+    # 條件篩選
+    def filter_card(self):
+        main = get_main()
+        if self.card_list.cdb is None:
+            return
+        msg = "以空白分隔条件, 例如 特性&舰队 战力>=3000\n运算: = != > >= < <= & (包含位元) !& (不包含位元)"
+        expr, ok = QInputDialog.getText(self, "条件筛选", msg, text=self.filter_expr)
+        if not ok:
+            return
+        try:
+            cond_lst = parse_filter(expr, self.cardinfo)
+        except ValueError as e:
+            main.show_error(str(e))
+            return
+        self.filter_expr = expr
+        self.card_list.search_filter(cond_lst)
+        self.updata()
+
     # 將當前編輯器內容打包成 Card 並返回
     def pack_card_data(self) -> Card:
         id, alias = self.card_data.get_code()
-        ot, setcode = 3, 0
-        data_list = [id, ot, alias, setcode, *self.card_data.get_data_list(), 0]
+        # 編輯器沒有 ot, setcode 與 category 的欄位, 沿用目前顯示的卡
+        if (now_c := self.card_list.get_now_card()) is not None:
+            ot, setcode, category = now_c.ot, now_c.setcode, now_c.category
+        else:
+            ot, setcode, category = 3, 0, 0
+        data_list = [id, ot, alias, setcode, *self.card_data.get_data_list(), category]
         text_lst = [id, *self.card_text.get_text_list()]
         c = Card(id)
         c.set_data(data_list)
@@ -98,7 +146,7 @@ class DataEditor(QWidget):
     def add_card(self):
         main = get_main()
         id, _ = self.card_data.get_code()
-        if (fb := main.file_list.get_file_btn()) is None:
+        if (fb := main.file_list.get_file_btn()) is None or self.is_locked(fb.cdb):
             return
         if id == 0:
             main.show_error("ID 不能為 0")
@@ -113,7 +161,7 @@ class DataEditor(QWidget):
     def save_card(self):
         main = get_main()
         id, _ = self.card_data.get_code()
-        if (fb := main.file_list.get_file_btn()) is None:
+        if (fb := main.file_list.get_file_btn()) is None or self.is_locked(fb.cdb):
             return
         if id == 0:
             main.show_error("ID 不能為 0")
@@ -122,13 +170,16 @@ class DataEditor(QWidget):
             main.show_error("当前没有可编辑的卡片, 请使用 添加")
             return
         cdb = fb.cdb
-        if now_c.id != id:
-            if cdb.has_id(id) and not main.show_quest(f"{id} 已存在, 是否覆盖"):
-                return
-            if main.show_quest(f"是否刪除 {now_c.id}"):
-                cdb.del_card(now_c.id)
+        # 在刪除舊 id 之前打包, 以沿用舊卡的 ot, setcode 與 category
+        card = self.pack_card_data()
+        with cdb.journal.group("保存"):
+            if now_c.id != id:
+                if cdb.has_id(id) and not main.show_quest(f"{id} 已存在, 是否覆盖"):
+                    return
+                if main.show_quest(f"是否刪除 {now_c.id}"):
+                    cdb.del_card(now_c.id)
 
-        cdb.add_card(self.pack_card_data())
+            cdb.add_card(card)
         self.card_list.set_data_source(cdb)
         self.card_list.refresh_view()
         main.show_msg("修改成功")
@@ -138,7 +189,7 @@ class DataEditor(QWidget):
     # 刪除卡片
     def delete_card(self):
         main = get_main()
-        if (fb := main.file_list.get_file_btn()) is None:
+        if (fb := main.file_list.get_file_btn()) is None or self.is_locked(fb.cdb):
             return
         cdb = fb.cdb
         if not cdb.select_id_lst:
@@ -162,9 +213,8 @@ class DataEditor(QWidget):
         self.copy_card = {}
         copy_ct = 0
         for id in id_list:
-            if id in cdb.card_dict:
-                card = cdb.card_dict[id]
-                self.copy_card[id] = card
+            if (card := cdb.get_card(id)) is not None:
+                self.copy_card[id] = cdb.load_text(card)
                 copy_ct += 1
         main.show_msg(f"已复制 {copy_ct} 张卡片")
         main.update_paste_action_text(copy_ct)
@@ -180,8 +230,7 @@ class DataEditor(QWidget):
     def copy_all_card(self):
         if self.card_list.cdb is None:
             return
-        id_list = sorted(self.card_list.cdb.card_dict.keys(), key=lambda k: int(k))
-        self.copy_id_list(id_list)
+        self.copy_id_list(self.card_list.cdb.get_id_lst())
 
     # 粘贴卡片
     def paste_cards(self):
@@ -191,40 +240,188 @@ class DataEditor(QWidget):
         if self.card_list.cdb is None:
             return
         cdb = self.card_list.cdb
-        paste_ct = 0
-        last_id = None
+        if self.is_locked(cdb):
+            return
+        paste_lst = []
         for card in self.copy_card.values():
             id = card.id
-            try:
-                if cdb.has_id(id):
-                    if not main.show_quest(f"ID {id} 已存在, 是否覆蓋"):
-                        continue
-                cdb.add_card(card)
-                last_id = id
-                paste_ct += 1
-            except Exception:
-                continue
-        if paste_ct > 0:
-            if last_id:
-                cdb.now_id = last_id
+            if cdb.has_id(id):
+                if not main.show_quest(f"ID {id} 已存在, 是否覆蓋"):
+                    continue
+            paste_lst.append(card)
+        if paste_ct := cdb.add_cards(paste_lst, "粘贴"):
             self.card_list.set_data_source(cdb)
             self.card_list.refresh_view()
             self.updata()
             main.show_msg(f"已贴上 {paste_ct} 张卡片")
 
+    # 將其他 cdb 合併到當前 cdb
+    def merge_cdb(self):
+        main = get_main()
+        if (fb := main.file_list.get_file_btn()) is None or self.is_locked(fb.cdb):
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self, "选择要合并的 CDB", "", "CDB Files (*.cdb)"
+        )
+        if not path:
+            return
+        title_lst = list(MERGE_POLICIES.values())
+        title, ok = QInputDialog.getItem(
+            self, "合并数据库", "ID 相同但内容不同时", title_lst, 0, False
+        )
+        if not ok:
+            return
+        policy = list(MERGE_POLICIES)[title_lst.index(title)]
+        fb.saver.flush()
+        try:
+            diff = diff_cdb(fb.cdb.path, path)
+        except sqlite3.Error as e:
+            main.show_error(f"读取失败: {e}")
+            return
+        cancelled = False
+
+        # 逐一詢問, 取消後其餘的卡保留本地
+        def choose(d: CardDiff) -> bool:
+            nonlocal cancelled
+            if cancelled:
+                return False
+            res = main.show_quest(f"是否使用对方的内容\n{d.describe()}", True)
+            cancelled = res is None
+            return bool(res)
+
+        # 與命令列的 q 相同, 已做的選擇與只有對方有的卡仍會合併
+        card_lst = plan_merge(diff, policy, choose)
+        merge_ct = merge_into(fb.cdb, card_lst)
+        self.card_list.goto_now_id()
+        self.card_list.refresh_view()
+        self.updata()
+        note = "\n已取消逐一选择, 其余不同的卡保留本地" if cancelled else ""
+        main.show_msg(f"{diff.summary()}\n已合并 {merge_ct} 张卡片{note}")
+
+    # 將當前 cdb 的所有卡片導出為 csv 或 jsonl, 唯讀瀏覽時也可使用
+    def export_cards(self):
+        main = get_main()
+        if (fb := main.file_list.get_file_btn()) is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "导出卡片", "", "CSV Files (*.csv);;JSON Lines (*.jsonl)"
+        )
+        if not path:
+            return
+        if fb.saver is not None:
+            fb.saver.flush()
+        try:
+            export_ct = CardIO.export_file(fb.cdb.path, path)
+        except (ValueError, OSError, sqlite3.Error) as e:
+            main.show_error(f"导出失败: {e}")
+            return
+        main.show_msg(f"已导出 {export_ct} 张卡片")
+
+    # 從 csv 或 jsonl 導入卡片到當前 cdb, ID 相同時覆蓋
+    def import_cards(self):
+        main = get_main()
+        if (fb := main.file_list.get_file_btn()) is None or self.is_locked(fb.cdb):
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self, "导入卡片", "", "Card Files (*.csv *.jsonl)"
+        )
+        if not path:
+            return
+        # 先串流檢查整個檔案, 格式錯誤時不會寫入任何卡片
+        try:
+            CardIO.check_file(path)
+        except (ValueError, OSError) as e:
+            main.show_error(f"导入失败: {e}")
+            return
+        # 再逐張讀取加入, 不保留整個檔案的 Card
+        try:
+            import_ct = fb.cdb.add_cards(CardIO.iter_file_cards(path), "导入")
+        except (ValueError, OSError) as e:
+            # 檢查後檔案被修改, 已加入的卡保留
+            main.show_error(f"导入失败: {e}")
+            self.card_list.refresh_view()
+            return
+        if import_ct:
+            self.card_list.goto_now_id()
+            self.card_list.refresh_view()
+            self.updata()
+        main.show_msg(f"已导入 {import_ct} 张卡片")
+
+    # 撤銷
+    def undo(self):
+        self._apply_journal(True)
+
+    # 重做
+    def redo(self):
+        self._apply_journal(False)
+
+    def _apply_journal(self, undo: bool):
+        main = get_main()
+        if (cdb := self.card_list.cdb) is None or self.is_locked(cdb):
+            return
+        id_lst = cdb.undo() if undo else cdb.redo()
+        if not id_lst:
+            main.statusBar().showMessage(f"没有可{'撤销' if undo else '重做'}的操作", 3000)
+            return
+        self.card_list.goto_now_id()
+        self.card_list.refresh_view()
+        self.updata()
+        main.statusBar().showMessage(f"已{'撤销' if undo else '重做'} {len(id_lst)} 张卡片", 3000)
+
+    # 整理數據庫
+    def compact_cdb(self):
+        main = get_main()
+        if (fb := main.file_list.get_file_btn()) is None or self.is_locked(fb.cdb):
+            return
+        if fb.cdb.partial:
+            main.show_error("数据库未完整载入, 无法整理")
+            return
+        if not main.show_quest("是否按 ID 顺序重写整个数据库"):
+            return
+        fb.saver.flush()
+        if fb.cdb.compact():
+            main.show_msg("整理完成")
+        else:
+            main.show_error("整理失败")
+
+    # 檢查卡片內容是否符合 cardinfo, 以及 datas 與 texts 是否對應
+    def check_cdb(self):
+        main = get_main()
+        if (fb := main.file_list.get_file_btn()) is None:
+            return
+        cdb = fb.cdb
+        if cdb.loading:
+            main.show_error("数据库正在载入, 请稍后再检查")
+            return
+        rules = CardRules(self.cardinfo)
+        try:
+            # 唯讀瀏覽或未完整載入時直接檢查檔案
+            if cdb.read_only or cdb.partial:
+                violations = validate_file(rules, cdb.path)
+            else:
+                fb.saver.flush()
+                violations = validate_cdb(rules, cdb)
+        except sqlite3.Error as e:
+            main.show_error(f"检查失败: {e}")
+            return
+        if violations:
+            main.show_error(format_report(violations))
+        else:
+            main.show_msg("没有发现问题")
+
     # 腳本
     def open_script(self):
         cdb = self.card_list.cdb
         if not cdb or not cdb.path:
             return
         id = cdb.now_id
-        if id == 0 or id not in cdb.card_dict:
+        if id == 0 or not cdb.has_id(id):
             return
         cdb_dir = os.path.dirname(cdb.path)
         script_dir = os.path.join(cdb_dir, "script")
         script_path = os.path.join(script_dir, f"c{id}.lua")
 
-        card = cdb.card_dict[id]
+        card = cdb.get_card(id)
         default_lua = f"--{card.name} {id}\nlocal cm, m = GetID()\nfunction cm.initial_effect(c)\n\nend\n"
 
         if not os.path.exists(script_dir):
@@ -35,13 +35,14 @@ PATH_CARDINFO: str = os.path.join(BASE_DIR, "data", "cardinfo.txt")
 PATH_CONFIG: str = os.path.join(BASE_DIR, "data", "config.json")
 PATH_COVER: str = os.path.join(BASE_DIR, "data", "cover.jpg")
 PATH_ICON: str = os.path.join(BASE_DIR, "data", "app_icon.png")
+PATH_CACHE: str = os.path.join(BASE_DIR, "data", "cache")
 
 # ---------------- 資料庫 ----------------
 SQL_DATA_KEYS: str = "ot,alias,setcode,type,atk,def,level,race,attribute,category"
 SQL_TEXT_KEYS: str = "name,desc,str1,str2,str3,str4,str5,str6,str7,str8,str9,str10,str11,str12,str13,str14,str15,str16"
 
 
-def get_sql_code_data() -> tuple[str, str]:
+def get_sql_code_data() -> tuple[str, str, str]:
     keys_list = SQL_DATA_KEYS.split(",")
     key_type_list = [f"{key} INTEGER" for key in keys_list]
     column_str = ",\n        ".join(key_type_list)
@@ -54,10 +55,11 @@ def get_sql_code_data() -> tuple[str, str]:
     key_ct = len(keys_list) + 1
     insert_str = ",".join(["?"] * key_ct)
     insert_code = f"INSERT INTO datas VALUES ({insert_str})"
-    return (set_code, insert_code)
+    replace_code = f"INSERT OR REPLACE INTO datas VALUES ({insert_str})"
+    return (set_code, insert_code, replace_code)
 
 
-def get_sql_code_text() -> tuple[str, str]:
+def get_sql_code_text() -> tuple[str, str, str]:
     keys_list = SQL_TEXT_KEYS.split(",")
     key_type_list = [f"{key} TEXT" for key in keys_list]
     column_str = ",\n        ".join(key_type_list)
@@ -70,4 +72,19 @@ def get_sql_code_text() -> tuple[str, str]:
     key_ct = len(keys_list) + 1
     insert_str = ",".join(["?"] * key_ct)
     insert_code = f"INSERT INTO texts VALUES ({insert_str})"
-    return (set_code, insert_code)
+    replace_code = f"INSERT OR REPLACE INTO texts VALUES ({insert_str})"
+    return (set_code, insert_code, replace_code)
+
+
+def get_sql_code_load(text_keys: str = SQL_TEXT_KEYS, where: str = "") -> str:
+    """
+    以 id 連接 datas 與 texts 的查詢, 欄位順序為 datas 全欄 + texts 的 id 與 text_keys
+    where 為附加的 WHERE 子句, 結果依 id 排序, id 為 datas 的主鍵所以不需要額外排序
+    """
+    data_cols = ["datas.id"] + [f'datas."{k}"' for k in SQL_DATA_KEYS.split(",")]
+    text_cols = ["texts.id"] + [f'texts."{k}"' for k in text_keys.split(",")]
+    column_str = ", ".join(data_cols + text_cols)
+    sql = f"SELECT {column_str} FROM datas LEFT JOIN texts USING(id)"
+    if where:
+        sql += f" {where}"
+    return sql + " ORDER BY datas.id"
@@ -0,0 +1,84 @@
+import sqlite3
+from typing import Iterator
+from DataBase import CDB
+from SaveWorker import CdbSaver
+from TextIndex import TextIndex
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+
+class IndexBuilder(QThread):
+    """
+    在背景以 CDB.begin_index_build 取得的文本建立一個 TextIndex
+    完成後以 built 交給 GUI 執行緒, 結束 (完成或失敗) 後發出 QThread.finished
+    """
+
+    built = pyqtSignal(str, object)  # 索引種類, 建立完成的 TextIndex
+    build_failed = pyqtSignal(str, str)  # 索引種類, 錯誤訊息
+
+    kind: str
+    docs: Iterator[tuple[int, str]]
+    touched: set[int]
+
+    def __init__(self, kind: str, docs: Iterator[tuple[int, str]], touched: set[int]):
+        super().__init__()
+        self.kind = kind
+        self.docs = docs
+        self.touched = touched
+
+    def run(self):
+        index = TextIndex()
+        try:
+            index.build(self.docs)
+        except sqlite3.Error as e:
+            self.build_failed.emit(self.kind, str(e))
+            return
+        self.built.emit(self.kind, index)
+
+
+class CdbIndexer(QObject):
+    """
+    每個開啟的 cdb 一個, 接手 CDB 文本索引的建立
+    搜尋需要的索引不存在或殘留過多時由 CDB.index_listener 通知, 在 IndexBuilder 中建立,
+    建立期間搜尋直接比對所有卡, 完成後以 CDB.finish_index_build 換上
+    """
+
+    cdb: CDB
+    saver: CdbSaver
+    builders: dict[str, IndexBuilder]
+
+    def __init__(self, cdb: CDB, saver: CdbSaver):
+        super().__init__()
+        self.cdb = cdb
+        self.saver = saver
+        self.builders = {}
+        cdb.index_listener = self.request
+
+    def request(self, kind: str):
+        if kind in self.builders:
+            return
+        # lazy_text 模式下未載入的文本從資料庫讀取, 先寫入尚未保存的修改
+        if self.cdb.lazy_text:
+            self.saver.flush()
+        docs, touched = self.cdb.begin_index_build(kind)
+        builder = IndexBuilder(kind, docs, touched)
+        builder.built.connect(self._on_built)
+        builder.build_failed.connect(self._on_build_failed)
+        builder.finished.connect(builder.deleteLater)
+        self.builders[kind] = builder
+        builder.start()
+
+    def _on_built(self, kind: str, index: TextIndex):
+        if (builder := self.builders.pop(kind, None)) is not None:
+            self.cdb.finish_index_build(kind, index, builder.touched)
+
+    # 失敗時下次搜尋再重新建立
+    def _on_build_failed(self, kind: str, error: str):
+        self.builders.pop(kind, None)
+
+    def close(self):
+        """等待建立中的索引結束, 結果不再採用, 並解除與 cdb 的連結"""
+        builders = list(self.builders.values())
+        self.builders.clear()
+        for builder in builders:
+            builder.wait()
+        self.cdb.index_listener = None
@@ -1,7 +1,14 @@
 import os
 import re
-from ConfigLoader import CardInfo, load_cardinfo
+import sqlite3
+from ConfigLoader import CardInfo, load_cardinfo, get_db_option
+from CardFilter import Cond
 from DataBase import CDB, Card
+from SqlCDB import SqlCDB
+from SaveWorker import CdbSaver
+from LoadWorker import CdbLoader
+from WatchWorker import CdbWatcher
+from IndexWorker import CdbIndexer
 from PyQt6.QtWidgets import (
     QToolBar,
     QSizePolicy,
@@ -17,6 +24,7 @@ from PyQt6.QtWidgets import (
     QTableWidget,
     QTableWidgetItem,
     QPushButton,
+    QProgressBar,
     QFileDialog,
     QApplication,
 )
@@ -31,21 +39,34 @@ from Global import PATH_COVER
 # 檔案分頁按鈕
 class CdbFileBtn(QWidget):
     filepath: str
+    read_only: bool
     fileBtn: QPushButton
     closeBtn: QPushButton
-    cdb: CDB
+    cdb: CDB | SqlCDB
+    saver: CdbSaver | None
+    loader: CdbLoader | None
+    watcher: CdbWatcher | None
+    indexer: CdbIndexer | None
+    resolving: bool
     act: QAction
     style_select: str
     style_unselect: str
 
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, read_only: bool = False):
         super().__init__()
         self.filepath = filepath
+        self.read_only = read_only
+        self.saver = None
+        self.watcher = None
+        self.indexer = None
+        self.loader = None
+        self.resolving = False
         self.style_select = "text-align: left; padding-left: 5px; background-color: rgb(180,200,255); color: black;"
         self.style_unselect = "text-align: left; padding-left: 5px;"
 
         # 檔案按鈕
-        self.fileBtn = QPushButton(os.path.basename(self.filepath), self)
+        title = os.path.basename(self.filepath)
+        self.fileBtn = QPushButton(f"[只读] {title}" if read_only else title, self)
         self.fileBtn.setGeometry(0, 0, 100, 30)
         self.fileBtn.clicked.connect(self.on_clicked)
 
@@ -58,15 +79,178 @@ class CdbFileBtn(QWidget):
         self.setFixedSize(100, 30)  # 容器大小
         QTimer.singleShot(0, self._ensure_main_visible)
 
-    # 載入 cdb
+    # 載入 cdb, 卡片以快照還原或由背景執行緒分批讀取, 唯讀瀏覽時不載入卡片
     def set_cdb(self):
-        self.cdb = CDB(self.filepath)
         main = get_main()
+        if self.read_only:
+            self.cdb = SqlCDB(self.filepath)
+            if main:
+                main.dataeditor.set_cdb(self.cdb)
+            else:
+                QTimer.singleShot(0, self._delayed_set_cdb)
+            QTimer.singleShot(0, self._show_load_report)
+            return
+        option = get_db_option(main.config if main else {})
+        self.cdb = CDB(
+            self.filepath,
+            lazy_text=option["lazy_text"],
+            text_cache_size=option["text_cache_size"],
+            load=False,
+            index_columns=option["index_columns"],
+            working_copy=option["working_copy"],
+        )
+        self.saver = CdbSaver(self.cdb)
+        self.saver.saved.connect(self._on_saved)
+        self.saver.conflicted.connect(self._on_conflicted)
+        self.watcher = CdbWatcher(self.cdb, self.saver)
+        self.watcher.reloaded.connect(self._on_external_change)
+        self.watcher.failed.connect(self._on_watch_failed)
+        self.indexer = CdbIndexer(self.cdb, self.saver)
+        self.cdb.begin_load()
+        # 檔案自上次關閉後沒有改變時直接以快照還原, 否則由背景執行緒讀取
+        # working_copy 模式下的副本一律在背景載入, 載入完成後才結束載入
+        if option["snapshot_cache"] and self.cdb.load_snapshot():
+            if self.cdb.working_copy:
+                self._start_loader(read_rows=False)
+            else:
+                self.cdb.finish_load()
+                QTimer.singleShot(0, self._show_load_report)
+        else:
+            self._start_loader()
         if main:
             main.dataeditor.set_cdb(self.cdb)
         else:
             QTimer.singleShot(0, self._delayed_set_cdb)
 
+    def _start_loader(self, read_rows: bool = True):
+        self.loader = CdbLoader(self.cdb, read_rows)
+        self.loader.copy_loaded.connect(self._on_copy_loaded)
+        self.loader.total_found.connect(self._on_load_total)
+        self.loader.rows_loaded.connect(self._on_rows_loaded)
+        self.loader.load_failed.connect(self._on_load_failed)
+        self.loader.finished.connect(self._on_load_finished)
+        self.loader.start()
+
+    # 回傳 cdb 是否正顯示在卡片列表
+    def is_shown(self) -> bool:
+        main = get_main()
+        return main is not None and main.dataeditor.card_list.cdb is self.cdb
+
+    def _on_load_total(self, total: int):
+        if self.loader is None:
+            return
+        self.cdb.load_total = total
+        if self.is_shown():
+            get_main().dataeditor.card_list.update_progress()
+
+    # 加入一批卡片, 第一批到達時顯示第一頁
+    def _on_rows_loaded(self, rows: list[tuple]):
+        if self.loader is None:  # 已關閉
+            return
+        first = not self.cdb.card_dict
+        self.cdb.load_rows(rows)
+        self.loader.chunk_done()
+        if not self.is_shown():
+            return
+        editor = get_main().dataeditor
+        editor.card_list.refresh_view()
+        if first:
+            editor.updata()
+
+    # 背景載入的 working copy, 已關閉時直接釋放
+    def _on_copy_loaded(self, conn: sqlite3.Connection, file_id: tuple | None):
+        if self.loader is None:
+            conn.close()
+            return
+        self.cdb.set_working_copy(conn, file_id, replace=False)
+
+    def _on_load_failed(self, error: str):
+        self.cdb.load_error = error
+
+    # 其他程式修改了 cdb, 只刷新受影響的顯示
+    def _on_external_change(self, changed: list[int], removed: list[int]):
+        main = get_main()
+        if main is None:
+            return
+        if self.is_shown():
+            main.dataeditor.card_list.refresh_view()
+            now_id = self.cdb.now_id
+            if now_id in changed or now_id in removed or not self.cdb.has_id(now_id):
+                main.dataeditor.updata()
+        # 以狀態列提示, 避免定時檢查時彈出對話框
+        name = os.path.basename(self.filepath)
+        msg = f"{name} 已被外部修改, 重新载入 {len(changed)} 张, 移除 {len(removed)} 张"
+        main.statusBar().showMessage(msg, 5000)
+
+    def _on_watch_failed(self, error: str):
+        if main := get_main():
+            name = os.path.basename(self.filepath)
+            main.statusBar().showMessage(f"{name} 读取外部修改失败: {error}", 5000)
+
+    def _on_load_finished(self):
+        if self.loader is None:
+            return
+        if self.loader.cancelled and self.loader.read_rows:
+            self.cdb.cancel_load()
+        else:
+            self.cdb.finish_load()
+        self.loader = None
+        if self.is_shown():
+            get_main().dataeditor.card_list.refresh_view()
+        self._show_load_report()
+
+    def _show_load_report(self):
+        if (report := self.cdb.get_load_report()) and (main := get_main()):
+            main.show_error(report)
+
+    def cancel_load(self):
+        """取消背景載入, 已讀取的卡片保留"""
+        if self.loader is not None:
+            self.loader.cancel()
+
+    # 背景寫入完成
+    def _on_saved(self, ok: bool, error: str):
+        if not ok and (main := get_main()):
+            main.show_error(f"保存 {os.path.basename(self.filepath)} 失败: {error}")
+
+    # 保存時與其他程式的修改衝突, 由使用者決定保留哪一方
+    def _on_conflicted(self, id_lst: list[int]):
+        main = get_main()
+        if main is None or self.resolving or not self.cdb.conflicts:
+            return
+        shown = ", ".join(str(id) for id in id_lst[:20])
+        if len(id_lst) > 20:
+            shown += f" ... 共 {len(id_lst)} 张"
+        msg = (
+            f"{os.path.basename(self.filepath)} 中以下卡片已被其他程序修改:\n{shown}\n"
+            "是否以本编辑器的内容覆盖? 选择否则载入其他程序的内容"
+        )
+        self.resolving = True
+        try:
+            keep_mine = main.show_quest(msg)
+        finally:
+            self.resolving = False
+        self.cdb.resolve_conflicts(keep_mine)
+        if self.is_shown():
+            main.dataeditor.card_list.refresh_view()
+            main.dataeditor.updata()
+
+    # 寫回所有修改並關閉 cdb
+    def close_cdb(self):
+        if (loader := self.loader) is not None:
+            self.loader = None
+            loader.cancel()
+            loader.wait()
+        if self.read_only:
+            self.cdb.close()
+            return
+        self.watcher.close()
+        self.indexer.close()
+        self.saver.close()
+        main = get_main()
+        option = get_db_option(main.config if main else {})
+        self.cdb.close(snapshot=option["snapshot_cache"])
+
     def _ensure_main_visible(self):
         main = get_main()
         if main:
@@ -106,6 +290,7 @@ class CdbFileBtn(QWidget):
         main = get_main()
         if main:
             main.dataeditor.set_cdb()
+        self.close_cdb()
         # 通知 toolbar 移除此 action
         try:
             main.file_list.remove_action(self.act)
@@ -147,8 +332,11 @@ class FileBtnToolBar(QToolBar):
         self.count = 0
         self.file_list = []
 
-    def add_cdbfile(self, filepath: str):
-        """根據傳入路徑新增一個 cdb 檔案分頁（若已存在則不新增）"""
+    def add_cdbfile(self, filepath: str, read_only: bool = False):
+        """
+        根據傳入路徑新增一個 cdb 檔案分頁（若已存在則不新增）
+        read_only 為 True 時以 SqlCDB 唯讀瀏覽, 不載入卡片
+        """
         # 基本路徑檢查
         if not (
             filepath
@@ -168,7 +356,7 @@ class FileBtnToolBar(QToolBar):
         if self.index != -1:
             self.file_list[self.index].deselect()
 
-        cdb_file: CdbFileBtn = CdbFileBtn(filepath)
+        cdb_file: CdbFileBtn = CdbFileBtn(filepath, read_only)
         self.index = self.count
         self.count += 1
         self.file_list.append(cdb_file)
@@ -252,6 +440,15 @@ class FileBtnToolBar(QToolBar):
         else:
             self.index = -1
 
+    def close_all(self):
+        """關閉所有分頁的 cdb 連線"""
+        for f in self.file_list:
+            f.close_cdb()
+
+    def find_file_btn(self, cdb: CDB | SqlCDB) -> CdbFileBtn | None:
+        """回傳開啟 cdb 的檔案按鈕"""
+        return next((f for f in self.file_list if f.cdb is cdb), None)
+
     def get_file_btn(self) -> CdbFileBtn | None:
         """獲取當前指向的檔案按鈕"""
         if self.index == -1:
@@ -455,6 +652,7 @@ class ImageSet(QLabel):
 class IDSet(QWidget):
     id: QLineEdit
     alias: QLineEdit
+    alias_info: QLabel
 
     def __init__(self, frame: QLayout):
         super().__init__()
@@ -481,12 +679,18 @@ class IDSet(QWidget):
         id_frame.addWidget(self.alias)
 
         main_frame.addWidget(id_panel)
+
+        # 同名卡關係: 指向的卡與以此卡為同名卡的卡
+        self.alias_info = QLabel()
+        self.alias_info.setWordWrap(True)
+        self.alias_info.hide()
+        main_frame.addWidget(self.alias_info)
         frame.addWidget(self)
 
-    # 搜索 ID 開頭的卡
+    # 搜索 ID 開頭或 ID 區間 (如 100000-100999) 的卡
     def search_id(self):
-        id = self.id.text()
-        if not re.fullmatch(r"[0-9]+", id):
+        id = self.id.text().replace(" ", "")
+        if not re.fullmatch(r"[0-9]+(-[0-9]+)?", id):
             id = ""
         main = get_main()
         main.dataeditor.card_list.search_id(id)
@@ -498,11 +702,38 @@ class IDSet(QWidget):
         alias = card.alias if card.alias != 0 else ""
         self.id.setText(str(id))
         self.alias.setText(str(alias))
+        self._show_alias_info(card)
+
+    # 顯示同名卡鏈, 循環, 指向不存在的卡, 以及以此卡為同名卡的卡
+    def _show_alias_info(self, card: Card):
+        main = get_main()
+        cdb = main.dataeditor.card_list.cdb if main else None
+        if cdb is None or cdb.loading:
+            self.alias_info.hide()
+            return
+        msg_lst = []
+        if card.alias:
+            chain, cycle = cdb.resolve_alias(card.id)
+            path = " → ".join(str(id) for id in chain)
+            if cycle:
+                msg_lst.append(f"同名卡循环: {path}")
+            elif not cdb.has_id(chain[-1]):
+                msg_lst.append(f"同名卡不存在: {path}")
+            elif len(chain) > 2:
+                msg_lst.append(f"同名卡链: {path}")
+        if id_lst := cdb.aliases_of(card.id):
+            shown = ", ".join(str(id) for id in id_lst[:5])
+            more = " ..." if len(id_lst) > 5 else ""
+            msg_lst.append(f"被 {len(id_lst)} 张卡当作同名卡: {shown}{more}")
+        self.alias_info.setText("\n".join(msg_lst))
+        self.alias_info.setToolTip(", ".join(str(id) for id in id_lst))
+        self.alias_info.setVisible(bool(msg_lst))
 
     # 清空當前內容
     def clear(self):
         self.id.setText("")
         self.alias.setText("")
+        self.alias_info.hide()
 
     # 獲取 id 與 同名卡
     def get_code(self):
@@ -653,10 +884,17 @@ class TypeSet(QWidget):
             0x21: "unittyp",
             0x2: "supptyp",
             0x4: "tacttyp",
-        }[typ & 0x2F]
-        self.main.setCurrentIndex(self.main.findData(main_typ))
-        sub_typ = f"0x{typ:X}"
-        self.sub.setCurrentIndex(self.sub.findData(sub_typ))
+        }.get(typ & 0x2F)
+        if main_typ is not None:
+            self.main.setCurrentIndex(self.main.findData(main_typ))
+        # cardinfo 中的值為小寫
+        sub_typ = f"0x{typ:x}"
+        index = self.sub.findData(sub_typ)
+        if index == -1:
+            # cardinfo 沒有的類型另外加入選項, 保留原本的值
+            self.sub.addItem(f"未知 {sub_typ}", sub_typ)
+            index = self.sub.count() - 1
+        self.sub.setCurrentIndex(index)
 
     def get_type(self) -> int:
         return int(self.sub.currentData(), 16)
@@ -780,8 +1018,10 @@ class CardListSet(QWidget):
     page_text: QLineEdit
     page_label: QLabel
     next_btn: QPushButton
+    load_bar: QProgressBar
+    cancel_btn: QPushButton
     # 卡片列表屬性
-    cdb: CDB | None
+    cdb: CDB | SqlCDB | None
     id_to_row: dict[int, int]
     # 前後頁屬性
     rows_per_page: int = 10  # 默認值，可被自動覆蓋
@@ -811,6 +1051,15 @@ class CardListSet(QWidget):
         page_frame.addWidget(self.page_label)
         self.next_btn = new_btn("下一頁", page_frame, self.next_page)
         page_frame.addStretch()
+        # 載入進度, 只在背景載入時顯示
+        load_frame: QHBoxLayout = new_frame("H", main_frame)
+        self.load_bar = QProgressBar()
+        self.load_bar.setStyleSheet("font-size: 12px;")
+        self.load_bar.setFormat("载入中 %v / %m")
+        load_frame.addWidget(self.load_bar)
+        self.cancel_btn = new_btn("取消", load_frame, self.cancel_load)
+        self.load_bar.setVisible(False)
+        self.cancel_btn.setVisible(False)
 
     # ---------------- 內部事件 ----------------
     def showEvent(self, event):
@@ -855,19 +1104,17 @@ class CardListSet(QWidget):
         # ------------------ 處理 Shift 範圍選擇 ------------------
         if modifiers & Qt.KeyboardModifier.ShiftModifier:
             pre_id = self.cdb.now_id
-            keys = self.cdb.show_id_lst
-            if keys and pre_id != 0:
-                try:
-                    ind_st = keys.index(pre_id)
-                    ind_ed = keys.index(clicked_id)
-                except ValueError:  # 如果 ID 不在當前列表
-                    ind_st, ind_ed = -1, -1
-                if ind_st != -1:
+            if pre_id != 0:
+                # 如果 ID 不在當前列表則為 -1
+                ind_st = self.cdb.get_show_index(pre_id)
+                ind_ed = self.cdb.get_show_index(clicked_id)
+                if ind_st != -1 and ind_ed != -1:
                     range_st = min(ind_st, ind_ed)
                     range_ed = max(ind_st, ind_ed)
                     self.cdb.select_id_lst.clear()
-                    for i in range(range_st, range_ed + 1):
-                        self.cdb.select_id_lst.add(keys[i])
+                    self.cdb.select_id_lst.update(
+                        self.cdb.get_show_ids(range_st, range_ed + 1)
+                    )
         # ------------------ 處理 Ctrl 選擇 ------------------
         elif modifiers & Qt.KeyboardModifier.ControlModifier:
             if clicked_id in self.cdb.select_id_lst:
@@ -896,16 +1143,13 @@ class CardListSet(QWidget):
         super().keyPressEvent(event)
 
     def _move_index(self, delta: int):
-        """根據目前 self.cdb.show_id_lst 的順序移動 now_ind 並觸發 on_item_clicked。"""
-        if self.cdb is None or not self.cdb.show_id_lst:
+        """根據目前顯示列表的順序移動 now_ind 並觸發 on_item_clicked。"""
+        if self.cdb is None or not (show_ct := self.cdb.show_count()):
             return
-        keys = self.cdb.show_id_lst
-        try:
-            cur_idx = keys.index(self.cdb.now_id)
-        except ValueError:  # 若沒有選擇，從 -1 開始
-            cur_idx = -1
+        # 若沒有選擇，從 -1 開始
+        cur_idx = self.cdb.get_show_index(self.cdb.now_id)
         new_idx = cur_idx + delta
-        if new_idx < 0 or new_idx >= len(keys):
+        if new_idx < 0 or new_idx >= show_ct:
             return  # 超出範圍則不動作
         new_page = (new_idx // self.rows_per_page) + 1
         # 目標行在當前頁，直接觸發 on_item_clicked
@@ -930,15 +1174,10 @@ class CardListSet(QWidget):
     def clear_filter(self):
         if self.cdb is None:
             return
-        all_ids = sorted(self.cdb.card_dict.keys(), key=lambda k: int(k))
-        self.cdb.show_id_lst = all_ids
-        if self.cdb.now_id not in self.cdb.show_id_lst and self.cdb.show_id_lst:
-            self.cdb.now_id = self.cdb.show_id_lst[0]
-        try:
-            now_idx = self.cdb.show_id_lst.index(self.cdb.now_id)
-            self.current_page = (now_idx // self.rows_per_page) + 1
-        except ValueError:
-            self.current_page = 1
+        self.cdb.clear_filter()
+        if self.cdb.get_show_index(self.cdb.now_id) == -1 and self.cdb.show_count():
+            self.cdb.now_id = self.cdb.get_show_ids(0, 1)[0]
+        self.goto_now_id()
         self.refresh_view()
 
     def search_id(self, id: str):
@@ -955,19 +1194,51 @@ class CardListSet(QWidget):
         self.now_page = 1
         self.refresh_view()
 
+    def search_text(self, text: str):
+        if self.cdb is None:
+            return
+        self.cdb.search_text(text)
+        self.now_page = 1
+        self.refresh_view()
+
+    def search_filter(self, cond_lst: list[Cond]):
+        if self.cdb is None:
+            return
+        self.cdb.search_filter(cond_lst)
+        self.now_page = 1
+        self.refresh_view()
+
+    # 取消目前 cdb 的背景載入
+    def cancel_load(self):
+        if self.cdb is None:
+            return
+        if (fb := get_main().file_list.find_file_btn(self.cdb)) is not None:
+            fb.cancel_load()
+
+    def update_progress(self):
+        """依 cdb 的載入狀態顯示或隱藏進度條"""
+        loading = self.cdb is not None and self.cdb.loading
+        self.load_bar.setVisible(loading)
+        self.cancel_btn.setVisible(loading)
+        if loading:
+            loaded = len(self.cdb.card_dict)
+            self.load_bar.setMaximum(max(self.cdb.load_total, loaded, 1))
+            self.load_bar.setValue(loaded)
+
     def refresh_view(self):
         """根據當前的 cdb 和過濾列表刷新 QTableWidget 的內容"""
         self.card_lst.setRowCount(0)
+        self.update_progress()
         if self.cdb is None:
             self.total_page = 1
             self.page_text.setText(str(self.now_page))
             self.page_label.setText(f"/ {self.total_page}")
             return
 
-        keys = self.cdb.show_id_lst if self.cdb else []
+        show_ct = self.cdb.show_count()
         self.calc_rows_per_page()
         self.total_page = max(
-            1, (len(keys) + self.rows_per_page - 1) // self.rows_per_page
+            1, (show_ct + self.rows_per_page - 1) // self.rows_per_page
         )
         # 頁碼校正
         if self.now_page > self.total_page:
@@ -977,16 +1248,14 @@ class CardListSet(QWidget):
         self.page_label.setText(f"/ {self.total_page}")
         # 計算當前頁的索引範圍
         st_ind = (self.now_page - 1) * self.rows_per_page
-        ed_ind = min(st_ind + self.rows_per_page, len(keys))
-        self.card_lst.setRowCount(ed_ind - st_ind)
+        page = self.cdb.get_show_page(st_ind, self.rows_per_page)
+        self.card_lst.setRowCount(len(page))
         self.id_to_row.clear()
         # 填充表格
-        for row, key_idx in enumerate(range(st_ind, ed_ind)):
-            card_id = keys[key_idx]
-            card = self.cdb.card_dict[card_id]
-            self.id_to_row[int(card.id)] = row
+        for row, (card_id, name) in enumerate(page):
+            self.id_to_row[card_id] = row
             is_selected = card_id in self.cdb.select_id_lst
-            for col, txt in enumerate([str(card.id), card.name]):
+            for col, txt in enumerate([str(card_id), name]):
                 item = QTableWidgetItem(txt)
                 item.setTextAlignment(
                     Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
@@ -1000,28 +1269,26 @@ class CardListSet(QWidget):
                 self.card_lst.setItem(row, col, item)
 
     # ---------------- 設定數據 ----------------
-    def set_data_source(self, cdb: CDB | None = None):
+    def set_data_source(self, cdb: CDB | SqlCDB | None = None):
         """設定卡片資料庫 (CDB) 並初始化卡片索引和過濾列表"""
         self.cdb = cdb
         if cdb is None:
             self.now_page = 1
             return
-        try:
-            now_idx = self.cdb.show_id_lst.index(self.cdb.now_id)
-            self.now_page = (now_idx // self.rows_per_page) + 1
-        except (ValueError, AttributeError):
+        self.goto_now_id()
+
+    # 將頁碼指向 now_id 所在的頁
+    def goto_now_id(self):
+        if (now_idx := self.cdb.get_show_index(self.cdb.now_id)) == -1:
             self.now_page = 1
+        else:
+            self.now_page = (now_idx // self.rows_per_page) + 1
 
     # 增加卡片
     def add_card(self, card: Card):
         if self.cdb:
             self.cdb.add_card(card)
-            try:
-                now_idx = self.cdb.show_id_lst.index(self.cdb.now_id)
-                self.current_page = (now_idx // self.rows_per_page) + 1
-            except ValueError:
-                self.current_page = 1
-
+            self.goto_now_id()
             self.refresh_view()
             get_main().dataeditor.updata()
 
@@ -1136,6 +1403,13 @@ class CardTextSet(QWidget):
         main.dataeditor.card_list.search_name(name)
         main.dataeditor.updata()
 
+    # 以卡名欄的內容搜索 name, desc 與脚本提示
+    def search_text(self):
+        text = self.name.text()
+        main = get_main()
+        main.dataeditor.card_list.search_text(text)
+        main.dataeditor.updata()
+
     # 點擊時導入卡圖
     def _on_image_clicked(self):
         # 檢查是否存在當前卡
@@ -1160,6 +1434,8 @@ class CardTextSet(QWidget):
     # ---------------- 設定數據 ----------------
     # 讀取卡片並更新卡片文本
     def load_card(self, card: Card):
+        if (cdb := get_main().dataeditor.card_list.cdb) is not None:
+            cdb.load_text(card)
         self.name.setText(card.name)
         self.hint.load_card(card)
         self.image.load_card(card)
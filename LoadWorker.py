@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+from contextlib import nullcontext
+from DataBase import CDB, iter_card_rows
+from PyQt6.QtCore import QThread, pyqtSignal
+
+# GUI 執行緒尚未處理的批次上限, 避免讀取比顯示快時整個檔案堆在信號佇列中
+MAX_PENDING_CHUNK = 4
+
+
+class CdbLoader(QThread):
+    """
+    以獨立的連線在背景串流讀取 cdb, 每批列以 rows_loaded 交給 GUI 執行緒
+    GUI 執行緒以 CDB.load_rows 加入後需呼叫 chunk_done, 讓背景執行緒繼續讀取
+    working_copy 模式下先在背景以 backup 載入副本並以 copy_loaded 交給 GUI 執行緒,
+    卡片從副本讀取, 檔案只讀一次, read_rows 為 False 時只載入副本
+    讀取結束 (完成, 取消或失敗) 後發出 QThread.finished
+    """
+
+    copy_loaded = pyqtSignal(object, object)  # working copy 的連線, 載入前的檔案識別
+    total_found = pyqtSignal(int)  # datas 的總列數
+    rows_loaded = pyqtSignal(object)  # 一批 iter_card_rows 的列
+    load_failed = pyqtSignal(str)  # 錯誤訊息
+
+    cdb: CDB
+    path: str
+    lazy: bool
+    read_rows: bool
+    cancelled: bool
+    slots: threading.Semaphore
+
+    def __init__(self, cdb: CDB, read_rows: bool = True):
+        super().__init__()
+        self.cdb = cdb
+        self.path = cdb.path
+        self.lazy = cdb.lazy_text
+        self.read_rows = read_rows
+        self.cancelled = False
+        self.slots = threading.Semaphore(MAX_PENDING_CHUNK)
+
+    def run(self):
+        shared = self.cdb.working_copy
+        if not shared and not self.read_rows:
+            return
+        try:
+            if shared:
+                conn, file_id = self.cdb.open_working_copy()
+            else:
+                conn = sqlite3.connect(self.path)
+        except sqlite3.Error as e:
+            self.load_failed.emit(str(e))
+            return
+        if shared:
+            # 副本交給 CDB 後 GUI 執行緒也會使用, 每次讀取都需持有 lock
+            self.copy_loaded.emit(conn, file_id)
+        if not self.read_rows:
+            return
+        lock = self.cdb.lock if shared else nullcontext()
+        rows_iter = iter_card_rows(conn, lazy=self.lazy)
+        try:
+            with lock:
+                total = conn.execute("SELECT COUNT(*) FROM datas").fetchone()[0]
+            self.total_found.emit(total)
+            while True:
+                with lock:
+                    rows = next(rows_iter, None)
+                if rows is None:
+                    break
+                self.slots.acquire()
+                if self.cancelled:
+                    break
+                self.rows_loaded.emit(rows)
+        except sqlite3.Error as e:
+            self.load_failed.emit(str(e))
+        finally:
+            # 取消時釋放未讀完的查詢
+            with lock:
+                rows_iter.close()
+            if not shared:
+                conn.close()
+
+    # GUI 執行緒: 一批列已處理完
+    def chunk_done(self):
+        self.slots.release()
+
+    def cancel(self):
+        """要求停止讀取, 已發出的批次仍會送達"""
+        self.cancelled = True
+        self.slots.release()
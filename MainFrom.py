@@ -1,7 +1,7 @@
 import sys
 import os
 import webbrowser
-from ConfigLoader import load_config, update_history, save_config
+from ConfigLoader import load_config, update_history, save_config, get_db_option
 from DataBase import creat_new_cdb
 from DataEditorFrom import DataEditor
 from ItemLib import FileBtnToolBar
@@ -67,10 +67,21 @@ class MainWindow(QMainWindow):
         file_menu = new_toolbtn("文件", main_toolbar)
         new_action("打开", self, file_menu, self.open_cdb)
         new_action("新建", self, file_menu, self.new_cdb)
+        new_action("只读浏览", self, file_menu, self.browse_cdb)
         file_menu.addSeparator()
         act_copy_sel = new_action("复制选中卡片", self, file_menu)
         act_copy_all = new_action("复制所有卡片", self, file_menu)
         self.act_paste = new_action("粘贴卡片", self, file_menu)
+        file_menu.addSeparator()
+        act_export = new_action("导出卡片", self, file_menu)
+        act_import = new_action("导入卡片", self, file_menu)
+        file_menu.addSeparator()
+        act_undo = new_action("撤销 Ctrl + Z", self, file_menu)
+        act_redo = new_action("重做 Ctrl + Y", self, file_menu)
+        file_menu.addSeparator()
+        act_merge = new_action("合并数据库", self, file_menu)
+        act_compact = new_action("整理数据库", self, file_menu)
+        act_validate = new_action("检查数据库", self, file_menu)
         # ---------------- 歷史 ----------------
         self.hist_menu = new_toolbtn("数据库历史", main_toolbar)
         self.updata_hist_menu()
@@ -89,10 +100,22 @@ class MainWindow(QMainWindow):
         act_copy_sel.triggered.connect(self.dataeditor.copy_select_card)
         act_copy_all.triggered.connect(self.dataeditor.copy_all_card)
         self.act_paste.triggered.connect(self.dataeditor.paste_cards)
+        act_export.triggered.connect(self.dataeditor.export_cards)
+        act_import.triggered.connect(self.dataeditor.import_cards)
+        act_merge.triggered.connect(self.dataeditor.merge_cdb)
+        act_compact.triggered.connect(self.dataeditor.compact_cdb)
+        act_validate.triggered.connect(self.dataeditor.check_cdb)
+        act_undo.triggered.connect(self.dataeditor.undo)
+        act_redo.triggered.connect(self.dataeditor.redo)
         # ---------------- 處理命令行參數 (自動載入雙擊的文件) ----------------
         if cdb_path and os.path.exists(cdb_path):
             self.open_path(cdb_path)
 
+    # 關閉視窗時寫回並關閉所有 cdb
+    def closeEvent(self, event):
+        self.file_list.close_all()
+        super().closeEvent(event)
+
     # ---------------- 處理單例通信 ----------------
     def handle_incoming_connection(self):
         """處理來自第二個應用程序實例的傳入連接"""
@@ -164,6 +187,15 @@ class MainWindow(QMainWindow):
             return
         self.open_path(path)
 
+    # 以唯讀方式瀏覽 cdb, 不載入卡片, 適合查閱大型資料庫
+    def browse_cdb(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Browse CDB File", "", "CDB Files (*.cdb)"
+        )
+        if not path:
+            return
+        self.file_list.add_cdbfile(path, read_only=True)
+
     # 新建 cdb
     def new_cdb(self):
         path, _ = QFileDialog.getSaveFileName(
@@ -171,7 +203,7 @@ class MainWindow(QMainWindow):
         )
         if not path:
             return
-        creat_new_cdb(path)
+        creat_new_cdb(path, get_db_option(self.config)["index_columns"])
         self.open_path(path)
 
     # ---------------- 粘贴卡片 ----------------
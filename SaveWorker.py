@@ -0,0 +1,85 @@
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
+from DataBase import CDB, ChangeSet
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+# 最後一次修改後等待多久才寫入 (毫秒), 期間的修改合併成一次交易
+SAVE_DELAY_MS = 300
+
+
+class CdbSaver(QObject):
+    """
+    每個開啟的 cdb 一個, 接手 CDB 的寫入
+    修改後重新計時, 停止修改 SAVE_DELAY_MS 後在 GUI 執行緒取出修改,
+    交給單一背景執行緒依序寫入, 完成後以 saved 信號回報
+    """
+
+    saved = pyqtSignal(bool, str)  # 是否成功, 錯誤訊息
+    conflicted = pyqtSignal(object)  # 與其他程式的修改衝突而未寫入的 id
+    _finished = pyqtSignal(object)  # 背景執行緒寫完的 ChangeSet
+
+    cdb: CDB
+    timer: QTimer
+    pool: ThreadPoolExecutor
+    pending: list[tuple[ChangeSet, Future]]
+
+    def __init__(self, cdb: CDB):
+        super().__init__()
+        self.cdb = cdb
+        self.pending = []
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(SAVE_DELAY_MS)
+        self.timer.timeout.connect(self.commit)
+        self._finished.connect(self._on_finished)
+        cdb.change_listener = self.schedule
+
+    # 有新修改, 重新計時
+    def schedule(self):
+        self.timer.start()
+
+    # 取出目前的修改交給背景執行緒
+    def commit(self):
+        self.timer.stop()
+        if not self.cdb.is_dirty():
+            return
+        changes = self.cdb.take_changes()
+        future = self.pool.submit(self._write, changes)
+        self.pending.append((changes, future))
+
+    # 背景執行緒: 寫入並通知 GUI 執行緒
+    def _write(self, changes: ChangeSet) -> ChangeSet:
+        try:
+            self.cdb.write_changes(changes)
+        except sqlite3.Error as e:
+            changes.error = str(e)
+        self._finished.emit(changes)
+        return changes
+
+    # GUI 執行緒: 交給 CDB 處理結果, 並發出 saved 與 conflicted
+    def _on_finished(self, changes: ChangeSet):
+        idx = next((i for i, (c, _) in enumerate(self.pending) if c is changes), -1)
+        if idx == -1:  # 已由 flush 處理
+            return
+        del self.pending[idx]
+        self.cdb.finish_changes(changes)
+        self.saved.emit(not changes.error, changes.error)
+        if changes.conflicts:
+            self.conflicted.emit(sorted(changes.conflicts))
+
+    def flush(self) -> bool:
+        """立即寫入所有修改並等待背景執行緒完成, 回傳是否全部成功"""
+        self.commit()
+        ok = True
+        while self.pending:
+            changes = self.pending[0][1].result()
+            ok = ok and not changes.error
+            self._on_finished(changes)
+        return ok
+
+    def close(self):
+        """寫入所有修改後停止背景執行緒, 並解除與 cdb 的連結"""
+        self.flush()
+        self.pool.shutdown()
+        self.cdb.change_listener = None
@@ -0,0 +1,86 @@
+import hashlib
+import marshal
+import os
+import sys
+from Global import PATH_CACHE, SQL_DATA_KEYS, SQL_TEXT_KEYS
+
+# 快照格式版本, 格式改變時遞增, 舊的快照會被視為不存在
+SNAPSHOT_VERSION = 1
+# 保留的快照數量, 超過時刪除最久未使用的
+SNAPSHOT_MAX = 8
+# 快照內容依賴的欄位配置與位元組順序
+_LAYOUT = (SNAPSHOT_VERSION, SQL_DATA_KEYS, SQL_TEXT_KEYS, sys.byteorder)
+
+
+def _file_stat(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def snapshot_key(path: str, lazy: bool) -> tuple | None:
+    """
+    以路徑, 修改時間, 大小, WAL 檔的狀態與欄位配置作為快照的鍵, 檔案不存在時回傳 None
+    空的 WAL 檔與沒有 WAL 檔視為相同, 開啟連線時建立的 WAL 檔不影響鍵
+    """
+    if (main := _file_stat(path)) is None:
+        return None
+    wal = _file_stat(path + "-wal")
+    if wal is not None and wal[1] == 0:
+        wal = None
+    return (os.path.normcase(os.path.abspath(path)), main, wal, lazy, _LAYOUT)
+
+
+def _snapshot_path(key: tuple) -> str:
+    name = hashlib.sha1(repr(key[0]).encode("utf-8")).hexdigest()
+    return os.path.join(PATH_CACHE, f"{name}{'-lazy' if key[3] else ''}.snap")
+
+
+def read_snapshot(key: tuple) -> object | None:
+    """回傳鍵相同的快照內容, 沒有快照, 檔案已改變或快照損壞時回傳 None"""
+    path = _snapshot_path(key)
+    try:
+        # 一次讀入再解析, 直接從檔案 marshal.load 會逐個物件讀檔, 慢很多
+        with open(path, "rb") as f:
+            stored_key, state = marshal.loads(f.read())
+        if stored_key != key:
+            return None
+        os.utime(path)  # 記錄使用時間供淘汰
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return state
+
+
+def write_snapshot(key: tuple, state: object) -> bool:
+    """
+    寫入快照, 先寫到暫存檔再取代, 讀取時不會看到寫到一半的檔案
+    state 只能包含 marshal 支援的型別, 失敗時回傳 False
+    """
+    path = _snapshot_path(key)
+    tmp_path = path + ".tmp"
+    try:
+        os.makedirs(PATH_CACHE, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(marshal.dumps((key, state)))
+        os.replace(tmp_path, path)
+    except (OSError, ValueError):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+    _evict()
+    return True
+
+
+# 只保留最近使用的 SNAPSHOT_MAX 個快照
+def _evict():
+    try:
+        entries = [e for e in os.scandir(PATH_CACHE) if e.name.endswith(".snap")]
+        entries.sort(key=lambda e: e.stat().st_mtime_ns, reverse=True)
+        for e in entries[SNAPSHOT_MAX:]:
+            os.remove(e.path)
+    except OSError:
+        pass
@@ -0,0 +1,345 @@
+import sqlite3
+from bisect import bisect_right
+from AliasGraph import AliasGraph
+from CardFilter import Cond, cond_to_sql
+from DataBase import Card, DATA_KEYS, is_id_text, parse_id_range, sql_data_version
+from Global import SQL_TEXT_KEYS, get_sql_code_load
+
+# 瀏覽用連線的設定: 禁止寫入, 以 mmap 讀檔, 頁快取保持小容量
+BROWSE_PRAGMAS: list[str] = [
+    "query_only = 1",
+    "mmap_size = 268435456",
+    "cache_size = -8192",
+]
+# 保留的分頁錨點數, 超過時清空重新累積
+ANCHOR_MAX = 4096
+# 保留的 id -> 篩選結果中位置的數量, 超過時清空重新累積
+POS_MAX = 65536
+
+sql_browse_card = get_sql_code_load(where="WHERE datas.id = ?")
+# {} 填入 WHERE 子句
+sql_browse_count = "SELECT COUNT(*) FROM datas LEFT JOIN texts USING(id){}"
+sql_browse_page = (
+    "SELECT datas.id, texts.name FROM datas LEFT JOIN texts USING(id){}"
+    " ORDER BY datas.id LIMIT ? OFFSET ?"
+)
+_DATA_CT = len(DATA_KEYS)
+_TEXT_COLS = [f'texts."{key}"' for key in SQL_TEXT_KEYS.split(",")]
+
+
+class SqlCDB:
+    """
+    唯讀瀏覽用的 cdb, 不建立 card_dict, 列表與搜尋都直接查詢 SQLite, 常駐記憶體與檔案大小無關
+    顯示, 選取與搜尋的介面與 CDB 相同, 篩選條件保存為 SQL 的 WHERE 子句
+    分頁以讀過的頁首尾 id 作為錨點, 以 id >= 錨點 從主鍵直接定位 (keyset pagination),
+    只在跳到沒有讀過的頁時才以 OFFSET 略過中間的列
+    讀過的頁記錄各 id 的位置, 移動選取時不需以 COUNT 計算位置
+    同名卡的反向索引在第一次查詢時以一次掃描建立
+    其他程式修改資料庫後, 下一次查詢時清除筆數, 錨點, 位置與同名卡索引
+    """
+
+    read_only: bool = True
+    path: str
+    conn: sqlite3.Connection | None
+    loading: bool
+    partial: bool
+    load_error: str
+    now_id: int
+    select_id_lst: set[int]
+    data_version: int
+    _conds: list[str]
+    _params: list
+    _count: int | None
+    _anchor_pos: list[int]
+    _anchor_ids: list[int]
+    _pos_of: dict[int, int]
+    _alias_graph: AliasGraph | None
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = None
+        self.loading = False
+        self.partial = False
+        self.load_error = ""
+        self.now_id = 0
+        self.select_id_lst = set()
+        self.data_version = 0
+        self._conds = []
+        self._params = []
+        self._count = None
+        self._anchor_pos = []
+        self._anchor_ids = []
+        self._pos_of = {}
+        self._alias_graph = None
+        try:
+            self.now_id = self._first_id()
+        except sqlite3.Error as e:
+            self.load_error = str(e)
+        if self.now_id:
+            self.select_id_lst.add(self.now_id)
+
+    # ---------------- 連線 ----------------
+    def get_conn(self) -> sqlite3.Connection:
+        """回傳唯讀的長連線, 第一次使用時開啟"""
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path)
+            for pragma in BROWSE_PRAGMAS:
+                try:
+                    self.conn.execute(f"PRAGMA {pragma}")
+                except sqlite3.Error:
+                    pass
+        return self.conn
+
+    def _query(self, sql: str, params: list | tuple = ()) -> list[tuple]:
+        return self.get_conn().execute(sql, params).fetchall()
+
+    def _sync(self):
+        """資料庫被其他程式修改時清除筆數, 錨點與同名卡索引"""
+        version = self._query(sql_data_version)[0][0]
+        if version != self.data_version:
+            self.data_version = version
+            self._reset_pages()
+            self._alias_graph = None
+
+    def close(self):
+        if self.conn is None:
+            return
+        try:
+            self.conn.close()
+        except sqlite3.Error:
+            pass
+        self.conn = None
+
+    def get_load_report(self) -> str:
+        return f"读取失败: {self.load_error}" if self.load_error else ""
+
+    # ---------------- 分頁 ----------------
+    def _where(self, *extra: str) -> str:
+        part_lst = self._conds + list(extra)
+        return " WHERE " + " AND ".join(part_lst) if part_lst else ""
+
+    def _reset_pages(self):
+        self._count = None
+        self._anchor_pos.clear()
+        self._anchor_ids.clear()
+        self._pos_of.clear()
+
+    def _add_anchor(self, pos: int, id: int):
+        if len(self._anchor_pos) >= ANCHOR_MAX:
+            self._anchor_pos.clear()
+            self._anchor_ids.clear()
+        i = bisect_right(self._anchor_pos, pos)
+        if i and self._anchor_pos[i - 1] == pos:
+            return
+        self._anchor_pos.insert(i, pos)
+        self._anchor_ids.insert(i, id)
+
+    def show_count(self) -> int:
+        """回傳目前篩選結果的數量"""
+        try:
+            self._sync()
+            if self._count is None:
+                sql = sql_browse_count.format(self._where())
+                self._count = self._query(sql, self._params)[0][0]
+        except sqlite3.Error:
+            return 0
+        return self._count or 0
+
+    def get_show_page(self, start: int, count: int) -> list[tuple[int, str]]:
+        """回傳篩選結果中第 start 筆起的 count 筆 (id, name)"""
+        if count <= 0:
+            return []
+        try:
+            self._sync()
+        except sqlite3.Error:
+            return []
+        # 從 start 之前最近的錨點開始, 錨點之後的列以主鍵定位
+        i = bisect_right(self._anchor_pos, start)
+        if i:
+            pos, id = self._anchor_pos[i - 1], self._anchor_ids[i - 1]
+            where = self._where("datas.id >= ?")
+            params = [*self._params, id, count, start - pos]
+        else:
+            where = self._where()
+            params = [*self._params, count, start]
+        try:
+            rows = self._query(sql_browse_page.format(where), params)
+        except sqlite3.Error:
+            return []
+        if rows:
+            self._add_anchor(start, rows[0][0])
+            self._add_anchor(start + len(rows) - 1, rows[-1][0])
+            if len(self._pos_of) + len(rows) > POS_MAX:
+                self._pos_of.clear()
+            self._pos_of.update(zip((r[0] for r in rows), range(start, start + len(rows))))
+        return [(id, name or "") for id, name in rows]
+
+    def get_show_ids(self, start: int, stop: int) -> list[int]:
+        """回傳篩選結果中第 start 到 stop - 1 筆的 id"""
+        return [id for id, _ in self.get_show_page(start, stop - start)]
+
+    def _contains(self, id: int) -> bool:
+        """id 是否在篩選結果中, 以主鍵查詢"""
+        sql = sql_browse_count.format(self._where("datas.id = ?"))
+        return bool(self._query(sql, [*self._params, id])[0][0])
+
+    def get_show_index(self, id: int) -> int:
+        """
+        回傳 id 在篩選結果中的位置, 不存在時回傳 -1
+        讀過的頁直接查表, 其他 id 才以 COUNT 計算並記錄
+        """
+        try:
+            self._sync()
+            if (pos := self._pos_of.get(id)) is not None:
+                return pos
+            if not self._contains(id):
+                return -1
+            sql = sql_browse_count.format(self._where("datas.id < ?"))
+            pos = self._query(sql, [*self._params, id])[0][0]
+        except sqlite3.Error:
+            return -1
+        self._pos_of[id] = pos
+        return pos
+
+    # ---------------- 讀取卡片 ----------------
+    def _first_id(self) -> int:
+        rows = self._query(sql_browse_page.format(self._where()), [*self._params, 1, 0])
+        return rows[0][0] if rows else 0
+
+    def get_first_id(self) -> int:
+        try:
+            return self._first_id()
+        except sqlite3.Error:
+            return 0
+
+    def get_id_lst(self) -> list[int]:
+        """回傳按 id 排序的所有卡片 id"""
+        try:
+            return [r[0] for r in self._query("SELECT id FROM datas ORDER BY id")]
+        except sqlite3.Error:
+            return []
+
+    def get_card(self, id: int | str | None) -> Card | None:
+        """回傳指定 id 的 Card, 找不到對應 id 回傳 None"""
+        if not id:
+            return None
+        try:
+            rows = self._query(sql_browse_card, (int(id),))
+        except (TypeError, ValueError, sqlite3.Error):
+            return None
+        if not rows:
+            return None
+        row = rows[0]
+        c = Card(row[0])
+        c.set_data([v or 0 for v in row[:_DATA_CT]])
+        c.set_text([row[0], *(t or "" for t in row[_DATA_CT + 1 :])])
+        return c
+
+    def has_id(self, id: int) -> bool:
+        try:
+            return bool(self._query("SELECT 1 FROM datas WHERE id = ?", (id,)))
+        except sqlite3.Error:
+            return False
+
+    def load_text(self, card: Card) -> Card:
+        """get_card 已讀取完整文本"""
+        return card
+
+    # ---------------- 同名卡 ----------------
+    def _get_alias_graph(self) -> AliasGraph:
+        """第一次使用時以一次掃描建立同名卡索引, 只記錄有 alias 的卡"""
+        self._sync()
+        if self._alias_graph is None:
+            graph = AliasGraph()
+            graph.build(self._query("SELECT id, alias FROM datas WHERE alias != 0"))
+            self._alias_graph = graph
+        return self._alias_graph
+
+    def aliases_of(self, id: int) -> list[int]:
+        """回傳以 id 為同名卡的已排序 id"""
+        try:
+            return sorted(self._get_alias_graph().aliases_of(id))
+        except sqlite3.Error:
+            return []
+
+    def resolve_alias(self, id: int) -> tuple[list[int], bool]:
+        """與 CDB.resolve_alias 相同"""
+        try:
+            return self._get_alias_graph().resolve(id)
+        except sqlite3.Error:
+            return [id], False
+
+    # ---------------- 搜尋 ----------------
+    def set_filter(self, conds: list[str], params: list):
+        """
+        以 conds 作為篩選條件, 同時清空已選中的卡
+        now_id 不在篩選結果中時改為第一張
+        """
+        self._conds = conds
+        self._params = params
+        self._reset_pages()
+        # 只確認 now_id 是否在結果中, 位置等到需要時再計算
+        try:
+            keep = self._contains(self.now_id)
+        except sqlite3.Error:
+            keep = False
+        if not keep:
+            self.now_id = self.get_first_id()
+            if self.now_id:
+                self._pos_of[self.now_id] = 0
+        self.select_id_lst.clear()
+        self.select_id_lst.add(self.now_id)
+
+    def clear_filter(self):
+        """顯示所有卡片, 保留選中的卡"""
+        self._conds = []
+        self._params = []
+        self._reset_pages()
+
+    def search_id(self, id_prefix: str):
+        """
+        根據 id 篩選卡片, 規則與 CDB.search_id 相同
+        前綴轉為各位數的 id 區間, 可直接使用主鍵
+        """
+        id_prefix = id_prefix.replace(" ", "")
+        if not id_prefix:
+            self.set_filter([], [])
+        elif (id_range := parse_id_range(id_prefix)) is not None:
+            self.set_filter(["datas.id BETWEEN ? AND ?"], list(id_range))
+        elif not is_id_text(id_prefix):
+            self.set_filter(["0"], [])
+        elif id_prefix.startswith("0"):
+            self.set_filter(["datas.id = 0" if id_prefix == "0" else "0"], [])
+        else:
+            prefix = int(id_prefix)
+            try:
+                max_id = self._query("SELECT MAX(id) FROM datas")[0][0] or 0
+            except sqlite3.Error:
+                max_id = 0
+            part_lst, params = [], []
+            scale = 1
+            while prefix * scale <= max_id:
+                part_lst.append("datas.id BETWEEN ? AND ?")
+                params += [prefix * scale, (prefix + 1) * scale - 1]
+                scale *= 10
+            self.set_filter([f"({' OR '.join(part_lst) or '0'})"], params)
+
+    def search_name(self, name: str):
+        """根據 name 篩選卡片 (不區分大小寫), 如果為空則顯示所有卡片"""
+        if not name:
+            self.set_filter([], [])
+            return
+        self.set_filter(["instr(lower(texts.name), lower(?)) > 0"], [name])
+
+    def search_text(self, text: str):
+        """根據 name, desc 與 strs 全文篩選卡片 (不區分大小寫), 如果為空則顯示所有卡片"""
+        if not text:
+            self.set_filter([], [])
+            return
+        cond = " OR ".join(f"instr(lower({col}), lower(?)) > 0" for col in _TEXT_COLS)
+        self.set_filter([f"({cond})"], [text] * len(_TEXT_COLS))
+
+    def search_filter(self, cond_lst: list[Cond]):
+        """根據 CardFilter 的條件篩選卡片, 如果為空則顯示所有卡片"""
+        where, params = cond_to_sql(cond_lst)
+        self.set_filter([where.removeprefix("WHERE ")] if where else [], params)
@@ -0,0 +1,134 @@
+from array import array
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# 4 bytes 的 id 陣列可保存的範圍, 超出時整個索引改用 8 bytes
+_SMALL_ID_MAX = 0xFFFFFFFF
+
+_EMPTY_IDS: frozenset[int] = frozenset()
+
+
+# 將文本拆成 1-gram 與 2-gram, 中文不需分詞即可做子字串搜尋
+def split_gram(text: str) -> set[str]:
+    text = text.lower()
+    gram_set = set(text)
+    gram_set.update(text[i : i + 2] for i in range(len(text) - 1))
+    gram_set.discard("\n")
+    return gram_set
+
+
+# 已排序的 id 陣列中是否有 id
+def _has(ids: array, id: int) -> bool:
+    i = bisect_left(ids, id)
+    return i < len(ids) and ids[i] == id
+
+
+class TextIndex:
+    """
+    以 1-gram 與 2-gram 建立的倒排索引
+    build 將每個 gram 的 id 一次寫成已排序的 array, 之後加入或修改的文本記錄在 delta 的集合中
+    查詢時先以 gram 的交集取得候選 id, 再以子字串比對確認結果
+    修改或刪除時不回收舊的 gram, 多出的候選會在確認時排除, 累積過多時整個重建
+    build 只使用傳入的文本, 可在背景執行緒建立後再交給 GUI 執行緒使用
+    """
+
+    postings: dict[str, array]
+    delta: dict[str, set[int]]
+    id_set: set[int]
+    stale_ct: int
+    delta_ct: int
+
+    def __init__(self):
+        self.postings = {}
+        self.delta = {}
+        self.id_set = set()
+        self.stale_ct = 0
+        self.delta_ct = 0
+
+    def build(self, docs: Iterable[tuple[int, str]]):
+        """以 (id, 文本) 重建整個索引, id 不可重複, 依 id 順序傳入時不需再排序"""
+        postings: dict[str, array] = {}
+        id_set = set()
+        typecode = "I"
+        last = -1
+        ordered = True
+        for id, text in docs:
+            if typecode == "I" and not 0 <= id <= _SMALL_ID_MAX:
+                typecode = "q"
+                postings = {gram: array("q", ids) for gram, ids in postings.items()}
+            if id <= last:
+                ordered = False
+            last = id
+            id_set.add(id)
+            for gram in split_gram(text):
+                if (ids := postings.get(gram)) is None:
+                    postings[gram] = array(typecode, (id,))
+                else:
+                    ids.append(id)
+        if not ordered:
+            postings = {gram: array(typecode, sorted(ids)) for gram, ids in postings.items()}
+        self.postings = postings
+        self.delta = {}
+        self.id_set = id_set
+        self.stale_ct = 0
+        self.delta_ct = 0
+
+    def add(self, id: int, text: str):
+        """加入或更新 id 的文本"""
+        if id in self.id_set:
+            self.stale_ct += 1
+        self.id_set.add(id)
+        self.delta_ct += 1
+        delta = self.delta
+        for gram in split_gram(text):
+            if (id_set := delta.get(gram)) is None:
+                delta[gram] = {id}
+            else:
+                id_set.add(id)
+
+    def discard(self, id: int):
+        """移除 id, 殘留的 gram 由查詢時的比對排除"""
+        if id in self.id_set:
+            self.id_set.discard(id)
+            self.stale_ct += 1
+
+    def need_rebuild(self) -> bool:
+        """殘留的 gram 或 delta 中的文本超過索引的四分之一時需要重建"""
+        limit = max(1000, len(self.id_set) // 4)
+        return self.stale_ct > limit or self.delta_ct > limit
+
+    def search(
+        self, query: str, match: Callable[[list[int], str], list[int]]
+    ) -> list[int]:
+        """
+        回傳文本包含 query 的已排序 id
+        match(候選 id, 小寫 query) 負責以實際文本確認並回傳符合的 id
+        """
+        query = query.lower()
+        if len(query) >= 2:
+            gram_lst = [query[i : i + 2] for i in range(len(query) - 1)]
+        else:
+            gram_lst = [query]
+        hit_lst = []
+        for gram in set(gram_lst):
+            ids = self.postings.get(gram, ())
+            extra = self.delta.get(gram, _EMPTY_IDS)
+            if not ids and not extra:
+                return []
+            hit_lst.append((ids, extra))
+        hit_lst.sort(key=lambda hit: len(hit[0]) + len(hit[1]))
+        ids, extra = hit_lst[0]
+        cand = set(ids)
+        cand.update(extra)
+        for ids, extra in hit_lst[1:]:
+            if len(cand) * 16 < len(ids):
+                # 候選已很少, 逐一在陣列中二分搜尋
+                cand = {id for id in cand if id in extra or _has(ids, id)}
+            else:
+                kept = cand.intersection(ids)
+                kept.update(cand.intersection(extra))
+                cand = kept
+            if not cand:
+                return []
+        cand.intersection_update(self.id_set)
+        return sorted(match(list(cand), query))
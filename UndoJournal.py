@@ -0,0 +1,207 @@
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from DataBase import Card
+
+# Card 中可復原的欄位, 不含 id
+CARD_FIELDS: tuple[str, ...] = (
+    "ot",
+    "alias",
+    "setcode",
+    "type",
+    "atk",
+    "def_",
+    "level",
+    "race",
+    "attribute",
+    "category",
+    "name",
+    "desc",
+    "strs",
+)
+# 歷史紀錄的容量, 以欄位數加上文字長度估算, 超過時捨棄最舊的紀錄
+UNDO_BUDGET = 2_000_000
+
+
+def card_fields(c: "Card") -> dict[str, object]:
+    """回傳 c 所有可復原欄位的值, 文本與寫入 texts 表時相同, strs 補齊為 16 條的 tuple"""
+    fields = {key: getattr(c, key) for key in CARD_FIELDS}
+    _, fields["name"], fields["desc"], *hints = c.get_text_row()
+    fields["strs"] = tuple(hints)
+    return fields
+
+
+def diff_fields(
+    old: "Card | None", new: "Card | None"
+) -> tuple[dict[str, object] | None, dict[str, object] | None]:
+    """
+    回傳 (修改前, 修改後) 不同的欄位, 不存在的卡為 None
+    新增與刪除時不存在的一方為 None, 另一方為完整的欄位
+    """
+    if old is None or new is None:
+        return (
+            None if old is None else card_fields(old),
+            None if new is None else card_fields(new),
+        )
+    before, after = {}, {}
+    old_fields = card_fields(old)
+    for key, value in card_fields(new).items():
+        if old_fields[key] != value:
+            before[key] = old_fields[key]
+            after[key] = value
+    return before, after
+
+
+# 估算欄位佔用的容量
+def _fields_cost(fields: dict[str, object] | None) -> int:
+    if not fields:
+        return 1
+    cost = len(fields)
+    for value in fields.values():
+        if isinstance(value, str):
+            cost += len(value)
+        elif isinstance(value, tuple):
+            cost += sum(len(s) for s in value)
+    return cost
+
+
+class CardDelta:
+    """一張卡的一次修改, before / after 為 None 表示卡片不存在"""
+
+    __slots__ = ("id", "before", "after")
+    id: int
+    before: dict[str, object] | None
+    after: dict[str, object] | None
+
+    def __init__(
+        self, id: int, before: dict[str, object] | None, after: dict[str, object] | None
+    ):
+        self.id = id
+        self.before = before
+        self.after = after
+
+
+class UndoEntry:
+    """一次操作 (添加, 保存, 刪除, 粘貼...) 包含的所有修改"""
+
+    label: str
+    deltas: list[CardDelta]
+    cost: int
+    overflow: bool
+
+    def __init__(self, label: str):
+        self.label = label
+        self.deltas = []
+        self.cost = 0
+        self.overflow = False
+
+    def add(self, delta: CardDelta):
+        self.deltas.append(delta)
+        self.cost += _fields_cost(delta.before) + _fields_cost(delta.after)
+
+
+class UndoJournal:
+    """
+    記錄卡片修改的欄位差異, 供復原與重做
+    同一個 group 中的修改合併成一筆紀錄, 總容量超過 budget 時捨棄最舊的紀錄
+    單筆紀錄本身超過 budget 時 (例如合併整個數據庫) 無法復原, 並清空所有紀錄
+    套用紀錄由 CDB.undo / CDB.redo 負責, 套用期間 paused 為 True 不會記錄
+    """
+
+    undo_lst: list[UndoEntry]
+    redo_lst: list[UndoEntry]
+    budget: int
+    cost: int
+    paused: bool
+    _group: UndoEntry | None
+    _depth: int
+
+    def __init__(self, budget: int = UNDO_BUDGET):
+        self.undo_lst = []
+        self.redo_lst = []
+        self.budget = budget
+        self.cost = 0
+        self.paused = False
+        self._group = None
+        self._depth = 0
+
+    @contextmanager
+    def group(self, label: str) -> Iterator[None]:
+        """將區塊中的修改合併成一筆紀錄, 可巢狀使用, 以最外層的 label 為準"""
+        if self._depth == 0:
+            self._group = UndoEntry(label)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                entry, self._group = self._group, None
+                if entry.overflow:
+                    self.clear()
+                elif entry.deltas:
+                    self._push(entry)
+
+    def record(self, id: int, old: "Card | None", new: "Card | None"):
+        """記錄 id 從 old 改為 new, 沒有欄位改變時不記錄"""
+        if self.paused:
+            return
+        before, after = diff_fields(old, new)
+        if before == after:
+            return
+        delta = CardDelta(id, before, after)
+        if (group := self._group) is not None:
+            if group.overflow:
+                return
+            group.add(delta)
+            if group.cost > self.budget:
+                group.overflow = True
+                group.deltas.clear()
+        else:
+            entry = UndoEntry("")
+            entry.add(delta)
+            self._push(entry)
+
+    # 新的紀錄會清空重做列表, cost 為復原與重做列表的總容量
+    def _push(self, entry: UndoEntry):
+        self.cost -= sum(e.cost for e in self.redo_lst)
+        self.redo_lst.clear()
+        self.undo_lst.append(entry)
+        self.cost += entry.cost
+        self._trim()
+
+    # 捨棄最舊的紀錄直到容量足夠, 最新的一筆總是保留
+    def _trim(self):
+        drop = 0
+        while self.cost > self.budget and drop < len(self.undo_lst) - 1:
+            self.cost -= self.undo_lst[drop].cost
+            drop += 1
+        del self.undo_lst[:drop]
+
+    def can_undo(self) -> bool:
+        return bool(self.undo_lst)
+
+    def can_redo(self) -> bool:
+        return bool(self.redo_lst)
+
+    def take_undo(self) -> UndoEntry | None:
+        """取出最新的紀錄並移到重做列表"""
+        if not self.undo_lst:
+            return None
+        entry = self.undo_lst.pop()
+        self.redo_lst.append(entry)
+        return entry
+
+    def take_redo(self) -> UndoEntry | None:
+        """取出最新的重做紀錄並移回復原列表"""
+        if not self.redo_lst:
+            return None
+        entry = self.redo_lst.pop()
+        self.undo_lst.append(entry)
+        return entry
+
+    def clear(self):
+        self.undo_lst.clear()
+        self.redo_lst.clear()
+        self.cost = 0
@@ -0,0 +1,126 @@
+import sqlite3
+from DataBase import CDB
+from SaveWorker import CdbSaver
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+# 檢查外部修改的間隔 (毫秒)
+WATCH_INTERVAL_MS = 1000
+
+
+class CdbReloader(QThread):
+    """
+    以獨立的連線在背景讀取整個 cdb, 以 CDB.scan_external 與 row_version 的快照比較
+    完成後以 scanned 交出改變的列與所有 id, 由 GUI 執行緒以 CDB.finish_reload 套用
+    working_copy 模式下讀取的是新載入的副本, 完成後保留在 copy 由 GUI 執行緒換上
+    """
+
+    scanned = pyqtSignal(object, object)  # 改變或新增的列, 資料庫中所有的 id
+    scan_failed = pyqtSignal(str)  # 錯誤訊息
+
+    cdb: CDB
+    base: dict[int, int]
+    copy: tuple[sqlite3.Connection, tuple[int, ...] | None] | None
+
+    def __init__(self, cdb: CDB, base: dict[int, int]):
+        super().__init__()
+        self.cdb = cdb
+        self.base = base
+        self.copy = None
+
+    def run(self):
+        try:
+            if self.cdb.working_copy:
+                conn, file_id = self.cdb.open_working_copy()
+            else:
+                conn = sqlite3.connect(self.cdb.path)
+        except sqlite3.Error as e:
+            self.scan_failed.emit(str(e))
+            return
+        try:
+            new_rows, seen = self.cdb.scan_external(conn, self.base)
+        except sqlite3.Error as e:
+            conn.close()
+            self.scan_failed.emit(str(e))
+            return
+        if self.cdb.working_copy:
+            self.copy = (conn, file_id)
+        else:
+            conn.close()
+        self.scanned.emit(new_rows, seen)
+
+    def discard(self):
+        """關閉沒有換上的副本"""
+        if self.copy is not None:
+            self.copy[0].close()
+            self.copy = None
+
+
+class CdbWatcher(QObject):
+    """
+    每個開啟的 cdb 一個, 定時以 CDB.has_external_change 檢查其他程式的修改
+    發現修改時先寫入自己尚未保存的修改, 再以 CdbReloader 在背景讀取比較,
+    GUI 執行緒只套用改變的卡, 讀取期間不再檢查
+    """
+
+    reloaded = pyqtSignal(object, object)  # 改變或新增的 id, 移除的 id
+    failed = pyqtSignal(str)  # 錯誤訊息
+
+    cdb: CDB
+    saver: CdbSaver
+    timer: QTimer
+    reloader: CdbReloader | None
+
+    def __init__(self, cdb: CDB, saver: CdbSaver):
+        super().__init__()
+        self.cdb = cdb
+        self.saver = saver
+        self.reloader = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(WATCH_INTERVAL_MS)
+        self.timer.timeout.connect(self.check)
+        self.timer.start()
+
+    def check(self):
+        if self.reloader is not None or not self.cdb.has_external_change():
+            return
+        self.saver.flush()
+        try:
+            base = self.cdb.begin_reload()
+        except sqlite3.Error as e:
+            self.failed.emit(str(e))
+            return
+        self.reloader = CdbReloader(self.cdb, base)
+        self.reloader.scanned.connect(self._on_scanned)
+        self.reloader.scan_failed.connect(self._on_scan_failed)
+        self.reloader.finished.connect(self._on_reload_finished)
+        self.reloader.start()
+
+    def _on_scanned(self, new_rows: list[tuple], seen: set[int]):
+        if self.reloader is None:
+            return
+        if self.reloader.copy is not None:
+            self.cdb.set_working_copy(*self.reloader.copy)
+            self.reloader.copy = None
+        changed, removed = self.cdb.finish_reload(self.reloader.base, new_rows, seen)
+        if changed or removed:
+            self.reloaded.emit(changed, removed)
+
+    def _on_scan_failed(self, error: str):
+        # 讀取失敗, 下次檢查時重試
+        self.cdb.data_version = -1
+        self.failed.emit(error)
+
+    def _on_reload_finished(self):
+        if self.reloader is not None:
+            self.reloader.deleteLater()
+            self.reloader = None
+
+    def close(self):
+        """停止檢查, 等待進行中的讀取結束, 結果不再套用"""
+        self.timer.stop()
+        if self.reloader is not None:
+            reloader = self.reloader
+            self.reloader = None
+            reloader.wait()
+            reloader.discard()
+            reloader.deleteLater()